@@ -3,6 +3,9 @@
 -- Using Influence Diagram + TOPSIS Algorithm
 -- ==========================================
 
+-- PostGIS for indexed distance queries (rooms.geom)
+CREATE EXTENSION IF NOT EXISTS postgis;
+
 -- Drop existing tables if needed (for development)
 DROP TABLE IF EXISTS room_attributes CASCADE;
 DROP TABLE IF EXISTS influence_edges CASCADE;
@@ -26,6 +29,9 @@ CREATE TABLE rooms (
     -- Location
     latitude FLOAT NOT NULL,
     longitude FLOAT NOT NULL,
+    geom GEOGRAPHY(Point, 4326) GENERATED ALWAYS AS (
+        ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography
+    ) STORED,
     neighbourhood VARCHAR(255),
     neighbourhood_cleansed VARCHAR(255),
     
@@ -84,6 +90,10 @@ CREATE INDEX idx_rooms_location ON rooms(latitude, longitude);
 CREATE INDEX idx_rooms_room_type ON rooms(room_type);
 CREATE INDEX idx_rooms_rating ON rooms(review_scores_rating);
 CREATE INDEX idx_rooms_status ON rooms(status);
+-- Recommendation candidates are always AVAILABLE rooms: the partial GiST index
+-- serves both ST_DWithin and KNN ordering (geom <-> point) without a full sort
+CREATE INDEX idx_rooms_available_geom ON rooms USING GIST(geom) WHERE status = 'AVAILABLE';
+CREATE INDEX idx_rooms_available_price ON rooms(price) WHERE status = 'AVAILABLE';
 
 
 -- ==========================================
@@ -121,6 +131,7 @@ CREATE TABLE room_attributes (
     criterion_id INT REFERENCES criteria(criterion_id) ON DELETE CASCADE,
     
     value DECIMAL(10, 4) NOT NULL,  -- Actual value (e.g., 500$, 2.5km, 4.8 stars)
+    normalized_value DOUBLE PRECISION,  -- 0-1 display value (radar chart), computed on import
     
     -- Metadata
     calculated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -288,6 +299,16 @@ WHERE e.is_active = TRUE AND p.is_active = TRUE AND c.is_active = TRUE
 ORDER BY p.display_order, e.weight_factor DESC;
 
 
+-- Materialized view: room type distribution for /stats
+-- Refreshed by the importer after loading rooms
+CREATE MATERIALIZED VIEW mv_room_type_counts AS
+SELECT room_type, COUNT(*) as count
+FROM rooms
+GROUP BY room_type;
+
+CREATE UNIQUE INDEX idx_mv_room_type_counts ON mv_room_type_counts(room_type);
+
+
 -- ==========================================
 -- COMMENTS FOR DOCUMENTATION
 -- ==========================================
@@ -3,31 +3,59 @@ Database connection management
 """
 
 import os
+import hashlib
+import threading
+from functools import lru_cache
 import psycopg2
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.extensions import connection as PGConnection
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+class PreparedStatementConnection(PGConnection):
+    """Connection that remembers which statements were PREPAREd on its session"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
 class Database:
-    """Database connection pool manager"""
+    """Database connection pool manager (thread-safe)"""
     
     _pool = None
+    _lock = threading.Lock()
     
     @classmethod
     def initialize(cls):
         """Initialize connection pool"""
-        if cls._pool is None:
-            cls._pool = SimpleConnectionPool(
-                minconn=1,
-                maxconn=10,
+        with cls._lock:
+            if cls._pool is not None:
+                return
+            
+            # The pool opens minconn connections up front, so the first
+            # requests don't pay connect + auth latency. Keepalives stop idle
+            # pooled connections from being dropped by firewalls/load balancers.
+            cls._pool = ThreadedConnectionPool(
+                minconn=int(os.getenv('DB_POOL_MIN', '5')),
+                maxconn=int(os.getenv('DB_POOL_MAX', '50')),
                 dbname=os.getenv('DB_NAME', 'stayhub'),
                 user=os.getenv('DB_USER', 'stayhub_user'),
                 password=os.getenv('DB_PASSWORD', 'stayhub_password'),
                 host=os.getenv('DB_HOST', 'localhost'),
-                port=os.getenv('DB_PORT', '5432')
+                port=os.getenv('DB_PORT', '5432'),
+                application_name='bnb-dss',
+                keepalives=1,
+                keepalives_idle=30,
+                keepalives_interval=10,
+                keepalives_count=3,
+                options=f"-c statement_timeout={os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000')}",
+                connection_factory=PreparedStatementConnection,
+                cursor_factory=RealDictCursor  # rows come back as dicts by default
             )
     
     @classmethod
@@ -46,9 +74,10 @@ class Database:
     @classmethod
     def close_all(cls):
         """Close all connections in the pool"""
-        if cls._pool is not None:
-            cls._pool.closeall()
-            cls._pool = None
+        with cls._lock:
+            if cls._pool is not None:
+                cls._pool.closeall()
+                cls._pool = None
 
 
 @contextmanager
@@ -58,18 +87,52 @@ def get_db_connection():
     try:
         yield conn
     finally:
+        # Always hand the connection back; the pool rolls back any open
+        # transaction and drops connections that were closed/broken
         Database.return_connection(conn)
 
 
+@lru_cache(maxsize=1)
+def get_server_version():
+    """Get PostgreSQL server version (cached, it never changes at runtime)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version() as version")
+        version = cursor.fetchone()
+        cursor.close()
+        return version['version']
+
+
 def test_connection():
     """Test database connection"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT version();")
-            version = cursor.fetchone()
-            cursor.close()
-            return True, version[0]
+        return True, get_server_version()
     except Exception as e:
         return False, str(e)
 
+
+def execute_prepared(cursor, query, params):
+    """
+    Execute a %s-parameterized query as a server-side prepared statement
+    
+    The statement is PREPAREd the first time a connection sees this query text,
+    later calls only send EXECUTE so PostgreSQL skips parsing and planning.
+    Falls back to a plain execute on connections not created by the pool.
+    """
+    prepared = getattr(cursor.connection, 'prepared_statements', None)
+    if prepared is None:
+        cursor.execute(query, params)
+        return
+    
+    name = 'stmt_' + hashlib.md5(query.encode()).hexdigest()
+    if name not in prepared:
+        # Rewrite %s placeholders to PostgreSQL's $1, $2, ...
+        parts = query.split('%s')
+        numbered = parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], 1))
+        cursor.execute(f"PREPARE {name} AS {numbered}")
+        prepared.add(name)
+    
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
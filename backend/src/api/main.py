@@ -4,23 +4,34 @@ BnB SmartChoice DSS Backend
 """
 
 import os
+import json
+import asyncio
+import hashlib
+import itertools
+import threading
 import time
 import uuid
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from datetime import datetime
 
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from psycopg2.extras import RealDictCursor
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
 from .models import (
     RecommendationRequest, RecommendationResponse, RecommendationResult,
     RoomSummary, WeightExplanation, HealthResponse, StatsResponse, UserLocation
 )
-from .database import Database, get_db_connection, test_connection
+from .database import (
+    Database, get_db_connection, get_server_version, test_connection, execute_prepared
+)
 from ..services.influence_engine import InfluenceEngine
 from ..services.topsis_engine import TOPSISEngine
+from ..utils.geo import haversine_km
 
 # Load environment variables
 load_dotenv()
@@ -42,16 +53,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Short-lived cache for /health and /stats (avoids repeated COUNT queries from probes)
+response_cache = TTLCache(maxsize=4, ttl=10)
+
+# Recent /recommend responses keyed by a quantized request fingerprint. Handlers run
+# in the threadpool, so access goes through a lock.
+recommend_cache = TTLCache(maxsize=1024, ttl=60)
+recommend_cache_lock = threading.Lock()
+recommend_cache_stats = {'hits': 0, 'misses': 0}
+
+# Location + filter combinations known to match no rooms, whatever the preferences
+# (guarded by recommend_cache_lock)
+empty_candidates_cache = TTLCache(maxsize=1024, ttl=30)
+EMPTY = object()
+
+# Frontend preference sliders, in the order used for the weights cache key
+PREFERENCE_KEYS = (
+    'price_sensitivity',
+    'comfort_priority',
+    'distance_tolerance',
+    'view_importance',
+    'cleanliness_priority',
+)
+
+
+# Criteria reference table, loaded once and served from memory
+app.state.criteria_by_code = None  # all criteria keyed by code
+app.state.criteria_list = None     # active criteria in display order
+
+# Process-wide DSS engines built from the reference tables (connection per call)
+app.state.influence_engine = None
+app.state.topsis_engine = None
+
+
+def load_criteria():
+    """(Re)load the criteria table and the engines built from it into app.state"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM criteria ORDER BY display_order")
+        rows = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        
+        criteria_by_code = {row['code']: row for row in rows}
+        influence_engine = InfluenceEngine.build_from_db(conn, criteria=criteria_by_code)
+    
+    app.state.criteria_by_code = criteria_by_code
+    app.state.criteria_list = [row for row in rows if row['is_active']]
+    app.state.influence_engine = influence_engine
+    app.state.topsis_engine = TOPSISEngine(criteria=criteria_by_code)
+
+
+def get_criteria_by_code():
+    """Preloaded criteria keyed by code (loads them if startup couldn't)"""
+    if app.state.criteria_by_code is None:
+        load_criteria()
+    return app.state.criteria_by_code
+
+
+def get_engines() -> Tuple[InfluenceEngine, TOPSISEngine]:
+    """Shared influence and TOPSIS engines (built on first use if startup couldn't)"""
+    if app.state.influence_engine is None:
+        load_criteria()
+    return app.state.influence_engine, app.state.topsis_engine
+
 
 # Startup/Shutdown Events
 @app.on_event("startup")
 async def startup_event():
     """Initialize database connection pool"""
     print("🚀 Starting BnB SmartChoice DSS API...")
+    response_cache.clear()
+    recommend_cache.clear()
+    empty_candidates_cache.clear()
+    get_server_version.cache_clear()
+    _cached_weights.cache_clear()
     Database.initialize()
     success, info = test_connection()
     if success:
         print(f"✅ Database connected: {info[:50]}...")
+        load_criteria()
+        print(f"✅ Loaded {len(app.state.criteria_by_code)} criteria")
     else:
         print(f"❌ Database connection failed: {info}")
 
@@ -66,6 +147,8 @@ async def shutdown_event():
 # ============================================
 # ENDPOINTS
 # ============================================
+# Endpoints doing blocking psycopg2 I/O are plain `def`: FastAPI runs them in
+# its worker threadpool so they don't stall the event loop.
 
 @app.get("/", tags=["General"])
 async def root():
@@ -78,29 +161,69 @@ async def root():
     }
 
 
+def _fetch_health_counts():
+    """Count rooms and active criteria in a single round-trip"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 
+                (SELECT COUNT(*) FROM rooms) as rooms_count,
+                (SELECT COUNT(*) FROM criteria WHERE is_active = TRUE) as criteria_count
+        """)
+        counts = cursor.fetchone()
+        cursor.close()
+        return counts['rooms_count'], counts['criteria_count']
+
+
+def _fetch_stats_summary():
+    """Room counts, price range and average rating in one table scan"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 
+                COUNT(*) as total_rooms,
+                COUNT(*) FILTER (WHERE status = 'AVAILABLE') as available_rooms,
+                MIN(price) as min_price,
+                AVG(price) as avg_price,
+                MAX(price) as max_price,
+                AVG(review_scores_rating) as avg_rating
+            FROM rooms
+        """)
+        summary = cursor.fetchone()
+        cursor.close()
+        return summary
+
+
+def _fetch_room_types():
+    """Room types distribution (precomputed by the importer)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT room_type, count FROM mv_room_type_counts")
+        room_types = {row['room_type']: row['count'] for row in cursor.fetchall()}
+        cursor.close()
+        return room_types
+
+
 @app.get("/health", response_model=HealthResponse, tags=["General"])
 async def health_check():
     """Health check endpoint"""
+    cached = response_cache.get("health")
+    if cached is not None:
+        return cached
+    
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Check rooms
-            cursor.execute("SELECT COUNT(*) FROM rooms")
-            rooms_count = cursor.fetchone()[0]
-            
-            # Check criteria
-            cursor.execute("SELECT COUNT(*) FROM criteria WHERE is_active = TRUE")
-            criteria_count = cursor.fetchone()[0]
-            
-            cursor.close()
-            
-            return HealthResponse(
-                status="healthy",
-                database="connected",
-                rooms_count=rooms_count,
-                criteria_count=criteria_count
-            )
+        rooms_count, criteria_count = await asyncio.to_thread(_fetch_health_counts)
+        
+        lookups = recommend_cache_stats['hits'] + recommend_cache_stats['misses']
+        response = HealthResponse(
+            status="healthy",
+            database="connected",
+            rooms_count=rooms_count,
+            criteria_count=criteria_count,
+            recommend_cache_hit_rate=recommend_cache_stats['hits'] / lookups if lookups else None
+        )
+        response_cache["health"] = response
+        return response
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
 
@@ -108,57 +231,86 @@ async def health_check():
 @app.get("/stats", response_model=StatsResponse, tags=["General"])
 async def get_statistics():
     """Get database statistics"""
+    cached = response_cache.get("stats")
+    if cached is not None:
+        return cached
+    
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Total rooms
-            cursor.execute("SELECT COUNT(*) as count FROM rooms")
-            total_rooms = cursor.fetchone()['count']
-            
-            # Available rooms
-            cursor.execute("SELECT COUNT(*) as count FROM rooms WHERE status = 'AVAILABLE'")
-            available_rooms = cursor.fetchone()['count']
-            
-            # Price range
-            cursor.execute("SELECT MIN(price) as min, AVG(price) as avg, MAX(price) as max FROM rooms")
-            price_stats = cursor.fetchone()
-            
-            # Average rating
-            cursor.execute("""
-                SELECT AVG(review_scores_rating) as avg_rating 
-                FROM rooms 
-                WHERE review_scores_rating IS NOT NULL
-            """)
-            avg_rating = cursor.fetchone()['avg_rating']
-            
-            # Room types distribution
-            cursor.execute("""
-                SELECT room_type, COUNT(*) as count 
-                FROM rooms 
-                GROUP BY room_type
-            """)
-            room_types = {row['room_type']: row['count'] for row in cursor.fetchall()}
-            
-            cursor.close()
-            
-            return StatsResponse(
-                total_rooms=total_rooms,
-                available_rooms=available_rooms,
-                price_range={
-                    'min': float(price_stats['min']) if price_stats['min'] else 0,
-                    'avg': float(price_stats['avg']) if price_stats['avg'] else 0,
-                    'max': float(price_stats['max']) if price_stats['max'] else 0
-                },
-                average_rating=float(avg_rating) if avg_rating else None,
-                room_types=room_types
-            )
+        # Independent queries run concurrently on separate pooled connections
+        summary, room_types = await asyncio.gather(
+            asyncio.to_thread(_fetch_stats_summary),
+            asyncio.to_thread(_fetch_room_types)
+        )
+        
+        response = StatsResponse(
+            total_rooms=summary['total_rooms'],
+            available_rooms=summary['available_rooms'],
+            price_range={
+                'min': float(summary['min_price']) if summary['min_price'] else 0,
+                'avg': float(summary['avg_price']) if summary['avg_price'] else 0,
+                'max': float(summary['max_price']) if summary['max_price'] else 0
+            },
+            average_rating=float(summary['avg_rating']) if summary['avg_rating'] else None,
+            room_types=room_types
+        )
+        response_cache["stats"] = response
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=1024)
+def _cached_weights(prefs_key: Tuple[float, ...]) -> Tuple[dict, list]:
+    """
+    Criterion weights and their explanations for a preference fingerprint
+    
+    The result only depends on the slider values and the (static) criteria and
+    influence diagram tables, so identical preferences skip the DB entirely.
+    """
+    # Map frontend preferences to backend weights
+    user_prefs = dict(zip(PREFERENCE_KEYS, prefs_key))
+    
+    # The shared engine has the diagram and criteria preloaded: no DB access here
+    influence_engine, _ = get_engines()
+    criterion_weights = influence_engine.calculate_weights(user_prefs)
+    weight_explanations = influence_engine.explain_weights(criterion_weights)
+    
+    return criterion_weights, weight_explanations
+
+
+def _recommend_cache_key(request: RecommendationRequest) -> str:
+    """
+    Fingerprint of a recommendation request
+    
+    Location is quantized to 3 decimals (~100 m) and preference sliders to steps
+    of 0.05, so nearby users with similar settings share cached responses.
+    """
+    payload = request.model_dump()
+    payload['user_location'] = {
+        key: round(value, 3) for key, value in payload['user_location'].items()
+    }
+    payload['preferences'] = {
+        key: round(round(value / 0.05) * 0.05, 2) if value is not None else None
+        for key, value in payload['preferences'].items()
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def _empty_recommendation(criterion_weights: dict, weight_explanations: list,
+                          start_time: float) -> RecommendationResponse:
+    """Response for a request whose filters match no rooms"""
+    return RecommendationResponse.model_construct(
+        session_id=str(uuid.uuid4()),
+        total_evaluated=0,
+        computed_weights=criterion_weights,
+        weight_explanations=[WeightExplanation.model_construct(**exp) for exp in weight_explanations],
+        ranked_results=[],
+        processing_time_ms=(time.time() - start_time) * 1000
+    )
+
+
 @app.post("/api/v1/dss/recommend", response_model=RecommendationResponse, tags=["Recommendations"])
-async def get_recommendations(request: RecommendationRequest):
+def get_recommendations(request: RecommendationRequest):
     """
     Main recommendation endpoint using Influence Diagram + TOPSIS with User Location
     
@@ -173,46 +325,46 @@ async def get_recommendations(request: RecommendationRequest):
     start_time = time.time()
     
     try:
+        cache_key = _recommend_cache_key(request)
+        with recommend_cache_lock:
+            cached = recommend_cache.get(cache_key)
+            recommend_cache_stats['hits' if cached is not None else 'misses'] += 1
+        if cached is not None:
+            return cached.model_copy(update={
+                'session_id': str(uuid.uuid4()),
+                'processing_time_ms': (time.time() - start_time) * 1000
+            })
+        
+        # Step 1: Convert preferences to weights using Influence Engine
+        # (cached per rounded preference fingerprint, results are shared: read-only)
+        prefs_key = tuple(round(getattr(request.preferences, key), 2) for key in PREFERENCE_KEYS)
+        criterion_weights, weight_explanations = _cached_weights(prefs_key)
+        
+        user_lat = request.user_location.latitude
+        user_lng = request.user_location.longitude
+        
+        # Skip the candidate query for filters that recently matched nothing
+        candidates_key = (
+            round(user_lat, 3), round(user_lng, 3),
+            request.filters.model_dump_json() if request.filters else None
+        )
+        with recommend_cache_lock:
+            known_empty = empty_candidates_cache.get(candidates_key) is EMPTY
+        if known_empty:
+            return _empty_recommendation(criterion_weights, weight_explanations, start_time)
+        
         with get_db_connection() as conn:
-            # Step 1: Convert preferences to weights using Influence Engine
-            influence_engine = InfluenceEngine(conn)
-            
-            # Map frontend preferences to backend weights
-            user_prefs = {
-                'price_sensitivity': request.preferences.price_sensitivity,
-                'comfort_priority': request.preferences.comfort_priority,
-                'distance_tolerance': request.preferences.distance_tolerance,
-                'view_importance': request.preferences.view_importance,
-                'cleanliness_priority': request.preferences.cleanliness_priority,
-            }
-            
-            criterion_weights = influence_engine.calculate_weights(user_prefs)
-            weight_explanations = influence_engine.explain_weights(criterion_weights)
-            
             # Step 2: Filter rooms based on hard constraints with distance calculation
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
+            
+            # User's location as a PostGIS point, compared against the rooms.geom column
+            # User coordinates are bound as parameters so the plan can be reused
+            user_point = "ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography"
             
             # Build WHERE clause
             where_conditions = ["status = 'AVAILABLE'"]
             params = []
             
-            # Haversine formula for distance calculation (in km)
-            # Using user's location coordinates
-            user_lat = request.user_location.latitude
-            user_lng = request.user_location.longitude
-            
-            # Distance formula without alias (for WHERE/HAVING clauses)
-            distance_formula = f"""(6371 * acos(
-                LEAST(1.0, GREATEST(-1.0,
-                    cos(radians({user_lat})) * cos(radians(latitude)) * 
-                    cos(radians(longitude) - radians({user_lng})) + 
-                    sin(radians({user_lat})) * sin(radians(latitude))
-                ))
-            ))"""
-            
-            # Distance select with alias (for SELECT clause)
-            distance_select = f"{distance_formula} as distance"
-            
             # Apply filters
             if request.filters:
                 if request.filters.min_price is not None:
@@ -241,78 +393,68 @@ async def get_recommendations(request: RecommendationRequest):
                 
                 if request.filters.superhost_only:
                     where_conditions.append("host_is_superhost = TRUE")
+                
+                # Radius search, served by the partial GiST index on geom
+                if request.filters.max_distance is not None:
+                    where_conditions.append(f"ST_DWithin(geom, {user_point}, %s * 1000.0)")
+                    params.extend([user_lng, user_lat, request.filters.max_distance])
             
             where_clause = " AND ".join(where_conditions)
             
-            # Get filtered rooms with distance calculation
+            # Get the nearest filtered candidates with all the columns needed for the
+            # response, so no second lookup is needed once TOPSIS has ranked them.
+            # Ordering uses the <-> KNN operator, which walks the partial GiST index
+            # (the status literal must stay inline to match its predicate); display
+            # distances for the selected rows are computed below in one vectorized pass.
             query = f"""
-                SELECT 
-                    room_id,
-                    latitude,
-                    longitude,
-                    {distance_select}
-                FROM rooms
-                WHERE {where_clause}
-                  AND latitude IS NOT NULL 
-                  AND longitude IS NOT NULL
-            """
-            
-            # Add distance filter if specified
-            if request.filters and request.filters.max_distance is not None:
-                query += f" AND {distance_formula} <= %s"
-                params.append(request.filters.max_distance)
-            
-            query += """
-                ORDER BY distance ASC, review_scores_rating DESC NULLS LAST
-                LIMIT 100
-            """
-            
-            cursor.execute(query, params)
-            room_data = cursor.fetchall()
-            
-            if not room_data:
-                cursor.close()
-                return RecommendationResponse(
-                    session_id=str(uuid.uuid4()),
-                    total_evaluated=0,
-                    computed_weights=criterion_weights,
-                    weight_explanations=[WeightExplanation(**exp) for exp in weight_explanations],
-                    ranked_results=[],
-                    processing_time_ms=(time.time() - start_time) * 1000
+                WITH candidates AS (
+                    SELECT 
+                        room_id, listing_id, name, price::float8 as price, latitude, longitude,
+                        room_type, accommodates, bedrooms::float8 as bedrooms, 
+                        review_scores_rating::float8 as review_scores_rating, number_of_reviews,
+                        picture_url, listing_url
+                    FROM rooms
+                    WHERE {where_clause}
+                      AND latitude IS NOT NULL 
+                      AND longitude IS NOT NULL
+                    ORDER BY geom <-> {user_point}, review_scores_rating DESC NULLS LAST
+                    LIMIT 100
                 )
+                SELECT * FROM candidates
+            """
+            params.extend([user_lng, user_lat])
             
-            room_ids = [row['room_id'] for row in room_data]
-            room_distances = {row['room_id']: float(row['distance']) for row in room_data}
-            
+            execute_prepared(cursor, query, params)
+            rooms_dict = {row['room_id']: dict(row) for row in cursor.fetchall()}
             cursor.close()
             
+            if not rooms_dict:
+                response = _empty_recommendation(criterion_weights, weight_explanations, start_time)
+                with recommend_cache_lock:
+                    recommend_cache[cache_key] = response
+                    empty_candidates_cache[candidates_key] = EMPTY
+                return response
+            
+            room_ids = list(rooms_dict.keys())
+            distances = haversine_km(
+                user_lat, user_lng,
+                [room['latitude'] for room in rooms_dict.values()],
+                [room['longitude'] for room in rooms_dict.values()]
+            )
+            room_distances = dict(zip(room_ids, distances.tolist()))
+            
             # Step 3: Rank using TOPSIS with distance integrated
-            topsis_engine = TOPSISEngine(conn)
-            topsis_results = topsis_engine.rank_alternatives(room_ids, criterion_weights)
+            _, topsis_engine = get_engines()
+            topsis_results = topsis_engine.rank_alternatives(conn, room_ids, criterion_weights)
             
-            # Step 4: Get room details for top results
+            # Step 4: Keep the top results (details are already in rooms_dict)
             top_results = topsis_results[:request.limit]
-            top_room_ids = [r['room_id'] for r in top_results]
-            
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            room_ids_str = ','.join(map(str, top_room_ids))
-            
-            # Get full room details with distance
-            cursor.execute(f"""
-                SELECT 
-                    room_id, listing_id, name, price, latitude, longitude,
-                    room_type, accommodates, bedrooms, 
-                    review_scores_rating, number_of_reviews,
-                    picture_url, listing_url,
-                    {distance_select}
-                FROM rooms
-                WHERE room_id IN ({room_ids_str})
-            """)
-            
-            rooms_dict = {row['room_id']: dict(row) for row in cursor.fetchall()}
-            cursor.close()
             
             # Step 5: Build response with distance information
+            # Result models use model_construct (no per-field validation): every value
+            # comes from the database or our own computations, and FastAPI still
+            # validates the response_model on the way out. Only the client's
+            # RecommendationRequest goes through full validation.
             ranked_results = []
             for result in top_results:
                 room_data = rooms_dict.get(result['room_id'])
@@ -333,9 +475,9 @@ async def get_recommendations(request: RecommendationRequest):
                         else:
                             explanation += f". Distance: {distance_km:.1f} km"
                     
-                    ranked_results.append(RecommendationResult(
+                    ranked_results.append(RecommendationResult.model_construct(
                         rank=result['rank'],
-                        room=RoomSummary(**room_data),
+                        room=RoomSummary.model_construct(**room_data),
                         topsis_score=result['topsis_score'],
                         explanation=explanation,
                         distance_to_ideal=result['distance_to_ideal'],
@@ -348,14 +490,17 @@ async def get_recommendations(request: RecommendationRequest):
             # Calculate processing time
             processing_time = (time.time() - start_time) * 1000
             
-            return RecommendationResponse(
+            response = RecommendationResponse.model_construct(
                 session_id=session_id,
                 total_evaluated=len(room_ids),
                 computed_weights=criterion_weights,
-                weight_explanations=[WeightExplanation(**exp) for exp in weight_explanations],
+                weight_explanations=[WeightExplanation.model_construct(**exp) for exp in weight_explanations],
                 ranked_results=ranked_results,
                 processing_time_ms=processing_time
             )
+            with recommend_cache_lock:
+                recommend_cache[cache_key] = response
+            return response
             
     except Exception as e:
         import traceback
@@ -363,8 +508,31 @@ async def get_recommendations(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail=f"Error processing recommendation: {str(e)}")
 
 
+def _stream_rooms(query: str, params: list):
+    """
+    Yield a {"rooms": [...], "total": N} JSON document row by row
+    
+    Rows are read through a server-side (named) cursor, so only `itersize` rows
+    are materialized at a time. The pooled connection is held until the stream
+    is consumed or closed.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(name='rooms_stream') as cursor:
+            cursor.itersize = 50
+            cursor.execute(query, params)
+            
+            yield '{"rooms": ['
+            total = 0
+            for room in cursor:
+                if total:
+                    yield ','
+                yield json.dumps(jsonable_encoder(room))
+                total += 1
+            yield f'], "total": {total}}}'
+
+
 @app.get("/api/v1/rooms", tags=["Rooms"])
-async def search_rooms(
+def search_rooms(
     city: Optional[str] = Query(None, description="Filter by city/location"),
     min_price: Optional[float] = Query(None, description="Minimum price"),
     max_price: Optional[float] = Query(None, description="Maximum price"),
@@ -374,64 +542,78 @@ async def search_rooms(
 ):
     """Simple room search endpoint (without DSS)"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            where_conditions = ["status = 'AVAILABLE'"]
-            params = []
-            
-            if min_price is not None:
-                where_conditions.append("price >= %s")
-                params.append(min_price)
-            
-            if max_price is not None:
-                where_conditions.append("price <= %s")
-                params.append(max_price)
-            
-            if min_rating is not None:
-                where_conditions.append("review_scores_rating >= %s")
-                params.append(min_rating)
-            
-            if room_type:
-                where_conditions.append("room_type = %s")
-                params.append(room_type)
-            
-            where_clause = " AND ".join(where_conditions)
-            params.append(limit)
-            
-            cursor.execute(f"""
-                SELECT 
-                    room_id, listing_id, name, price, latitude, longitude,
-                    room_type, accommodates, bedrooms, bathrooms,
-                    review_scores_rating, number_of_reviews,
-                    picture_url, listing_url,
-                    host_name, host_is_superhost
-                FROM rooms
-                WHERE {where_clause}
-                ORDER BY review_scores_rating DESC NULLS LAST
-                LIMIT %s
-            """, params)
-            
-            rooms = cursor.fetchall()
-            cursor.close()
-            
-            return {
-                "total": len(rooms),
-                "rooms": [dict(room) for room in rooms]
-            }
+        where_conditions = ["status = 'AVAILABLE'"]
+        params = []
+        
+        if min_price is not None:
+            where_conditions.append("price >= %s")
+            params.append(min_price)
+        
+        if max_price is not None:
+            where_conditions.append("price <= %s")
+            params.append(max_price)
+        
+        if min_rating is not None:
+            where_conditions.append("review_scores_rating >= %s")
+            params.append(min_rating)
+        
+        if room_type:
+            where_conditions.append("room_type = %s")
+            params.append(room_type)
+        
+        where_clause = " AND ".join(where_conditions)
+        params.append(limit)
+        
+        query = f"""
+            SELECT 
+                room_id, listing_id, name, price, latitude, longitude,
+                room_type, accommodates, bedrooms, bathrooms,
+                review_scores_rating, number_of_reviews,
+                picture_url, listing_url,
+                host_name, host_is_superhost
+            FROM rooms
+            WHERE {where_clause}
+            ORDER BY review_scores_rating DESC NULLS LAST
+            LIMIT %s
+        """
+        
+        stream = _stream_rooms(query, params)
+        # Start the stream here so query errors still become a 500 response
+        first_chunk = next(stream)
+        return StreamingResponse(itertools.chain([first_chunk], stream), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/rooms/{room_id}", tags=["Rooms"])
-async def get_room_details(room_id: int):
+def get_room_details(room_id: int):
     """Get detailed information for a specific room"""
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             
+            # Room and its attributes in one round-trip
             cursor.execute("""
-                SELECT * FROM rooms WHERE room_id = %s
+                SELECT 
+                    r.*,
+                    COALESCE(
+                        json_agg(
+                            json_build_object(
+                                'code', c.code,
+                                'name', c.name,
+                                'value', ra.value,
+                                'unit', c.unit,
+                                'is_active', c.is_active,
+                                'normalized_value', ra.normalized_value
+                            ) ORDER BY c.display_order
+                        ) FILTER (WHERE c.criterion_id IS NOT NULL),
+                        '[]'
+                    ) as attributes
+                FROM rooms r
+                LEFT JOIN room_attributes ra ON ra.room_id = r.room_id
+                LEFT JOIN criteria c ON c.criterion_id = ra.criterion_id
+                WHERE r.room_id = %s
+                GROUP BY r.room_id
             """, (room_id,))
             
             room = cursor.fetchone()
@@ -439,45 +621,24 @@ async def get_room_details(room_id: int):
             if not room:
                 raise HTTPException(status_code=404, detail="Room not found")
             
-            # Get attributes
-            cursor.execute("""
-                SELECT c.code, c.name, ra.value, c.unit
-                FROM room_attributes ra
-                JOIN criteria c ON ra.criterion_id = c.criterion_id
-                WHERE ra.room_id = %s
-                ORDER BY c.display_order
-            """, (room_id,))
-            
-            attributes = cursor.fetchall()
-            
-            # Get normalized values for radar chart
-            cursor.execute("""
-                SELECT c.code, ra.value
-                FROM room_attributes ra
-                JOIN criteria c ON ra.criterion_id = c.criterion_id
-                WHERE ra.room_id = %s AND c.is_active = TRUE
-            """, (room_id,))
-            
-            raw_attributes = cursor.fetchall()
+            room = dict(room)
+            attributes = room.pop('attributes')
+            room.pop('geom', None)  # PostGIS column, not meant for clients
             normalized_values = {}
             
-            # Simple normalization for visualization
-            for attr in raw_attributes:
-                code = attr['code'].lower()
-                value = float(attr['value'])
-                # Normalize to 0-1 range (simplified)
-                if code == 'price':
-                    normalized_values['price'] = min(1.0, 1.0 - (value / 1000000))  # Inverse for price
-                elif code.startswith('rating'):
-                    normalized_values[code.replace('rating_', '')] = value / 5.0  # Rating 0-5 to 0-1
-                else:
-                    normalized_values[code] = min(1.0, value / 100.0)  # Generic normalization
+            # 0-1 values for visualization (active criteria only), precomputed on import
+            for attr in attributes:
+                is_active = attr.pop('is_active')
+                normalized_value = attr.pop('normalized_value')
+                if is_active and normalized_value is not None:
+                    code = attr['code'].lower()
+                    normalized_values[code.replace('rating_', '')] = normalized_value
             
             cursor.close()
             
             return {
-                "room": dict(room),
-                "attributes": [dict(attr) for attr in attributes],
+                "room": room,
+                "attributes": attributes,
                 "normalized_values": normalized_values
             }
     except HTTPException:
@@ -487,32 +648,21 @@ async def get_room_details(room_id: int):
 
 
 @app.get("/api/v1/criteria", tags=["Configuration"])
-async def get_criteria():
+def get_criteria():
     """Get all active evaluation criteria"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            cursor.execute("""
-                SELECT * FROM criteria 
-                WHERE is_active = TRUE 
-                ORDER BY display_order
-            """)
-            
-            criteria = cursor.fetchall()
-            cursor.close()
-            
-            return {"criteria": [dict(c) for c in criteria]}
+        get_criteria_by_code()
+        return {"criteria": app.state.criteria_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/v1/influence-diagram", tags=["Configuration"])
-async def get_influence_diagram():
+def get_influence_diagram():
     """Get the influence diagram structure"""
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM v_influence_tree")
             
@@ -524,6 +674,21 @@ async def get_influence_diagram():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/admin/reload-criteria", tags=["Admin"])
+def reload_criteria():
+    """Reload the criteria table (and influence diagram) after it was changed in the database"""
+    try:
+        load_criteria()
+        # Weights and their explanations come from the rebuilt engines
+        _cached_weights.cache_clear()
+        response_cache.clear()
+        recommend_cache.clear()
+        empty_candidates_cache.clear()
+        return {"criteria_count": len(app.state.criteria_by_code)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================
 # Run with: uvicorn src.api.main:app --reload
 # ============================================
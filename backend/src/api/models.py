@@ -2,8 +2,8 @@
 Pydantic models for API request/response validation
 """
 
-from pydantic import BaseModel, Field
-from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Dict, List, Optional
 from datetime import date
 
 
@@ -11,6 +11,12 @@ from datetime import date
 # REQUEST MODELS
 # ============================================
 
+# Preference value: any non-negative weight (normalized by the influence engine)
+PreferenceWeight = Annotated[float, Field(ge=0.0)]
+
+# Legacy preference value on the 0-1 scale
+LegacyPreferenceWeight = Annotated[float, Field(ge=0.0, le=1.0)]
+
 
 class UserPreferences(BaseModel):
     """
@@ -23,42 +29,40 @@ class UserPreferences(BaseModel):
     
     Note: Values will be automatically normalized, so they can exceed 1.0
     """
+    # Defaults are trusted constants: only values sent by the client are validated
+    model_config = ConfigDict(validate_default=False)
+    
     # New frontend-compatible preferences
-    price_sensitivity: float = Field(
+    price_sensitivity: PreferenceWeight = Field(
         default=0.5, 
-        ge=0.0,
         description="Sensitivity to price (0=don't care, higher=more sensitive)",
         example=0.7
     )
-    comfort_priority: float = Field(
+    comfort_priority: PreferenceWeight = Field(
         default=0.5, 
-        ge=0.0,
         description="Priority for comfort/amenities (0=low, higher=more important)",
         example=0.8
     )
-    distance_tolerance: float = Field(
+    distance_tolerance: PreferenceWeight = Field(
         default=0.5, 
-        ge=0.0,
         description="Tolerance for distance (0=far ok, higher=must be near)",
         example=0.6
     )
-    view_importance: float = Field(
+    view_importance: PreferenceWeight = Field(
         default=0.5, 
-        ge=0.0,
         description="Importance of view/aesthetics (0=not important, higher=more important)",
         example=0.5
     )
-    cleanliness_priority: float = Field(
+    cleanliness_priority: PreferenceWeight = Field(
         default=0.5, 
-        ge=0.0,
         description="Priority for cleanliness (0=low, higher=more important)",
         example=0.9
     )
     
     # Backward compatibility (legacy fields)
-    convenience_importance: Optional[float] = Field(default=None, ge=0.0, le=1.0)
-    comfort_importance: Optional[float] = Field(default=None, ge=0.0, le=1.0)
-    value_importance: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    convenience_importance: Optional[LegacyPreferenceWeight] = None
+    comfort_importance: Optional[LegacyPreferenceWeight] = None
+    value_importance: Optional[LegacyPreferenceWeight] = None
 
 
 class UserLocation(BaseModel):
@@ -177,32 +181,42 @@ class RecommendationRequest(BaseModel):
         example=10
     )
     
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "user_location": {
-                    "latitude": 10.762622,
-                    "longitude": 106.660172
-                },
-                "preferences": {
-                    "price_sensitivity": 0.7,
-                    "comfort_priority": 0.8,
-                    "distance_tolerance": 0.6,
-                    "view_importance": 0.5,
-                    "cleanliness_priority": 0.9
-                },
-                "filters": {
-                    "max_price": 2000000,
-                    "min_rating": 4.0,
-                    "max_distance": 10
-                },
-                "limit": 10
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "user_location": {
+                "latitude": 10.762622,
+                "longitude": 106.660172
+            },
+            "preferences": {
+                "price_sensitivity": 0.7,
+                "comfort_priority": 0.8,
+                "distance_tolerance": 0.6,
+                "view_importance": 0.5,
+                "cleanliness_priority": 0.9
+            },
+            "filters": {
+                "max_price": 2000000,
+                "min_rating": 4.0,
+                "max_distance": 10
+            },
+            "limit": 10
         }
+    })
+
+
+# ============================================
+# RESPONSE MODELS
+# ============================================
+
+# Built server-side (see model_construct in main.py) and shared between requests
+# through the response caches, so instances are immutable
+RESPONSE_CONFIG = ConfigDict(frozen=True)
 
 
 class RoomSummary(BaseModel):
     """Summary information for a room"""
+    model_config = RESPONSE_CONFIG
+
     room_id: int
     listing_id: int
     name: str
@@ -221,6 +235,8 @@ class RoomSummary(BaseModel):
 
 class RecommendationResult(BaseModel):
     """Single recommendation result"""
+    model_config = RESPONSE_CONFIG
+
     rank: int
     room: RoomSummary
     topsis_score: float = Field(description="TOPSIS similarity score (0-1)")
@@ -231,6 +247,8 @@ class RecommendationResult(BaseModel):
 
 class WeightExplanation(BaseModel):
     """Explanation of calculated criterion weights"""
+    model_config = RESPONSE_CONFIG
+
     criterion_code: str
     criterion_name: str
     weight: float
@@ -241,6 +259,8 @@ class WeightExplanation(BaseModel):
 
 class RecommendationResponse(BaseModel):
     """Response from recommendation endpoint"""
+    model_config = RESPONSE_CONFIG
+
     session_id: str = Field(description="Session ID for caching")
     total_evaluated: int = Field(description="Total number of rooms evaluated")
     computed_weights: Dict[str, float] = Field(description="Calculated criterion weights")
@@ -251,14 +271,19 @@ class RecommendationResponse(BaseModel):
 
 class HealthResponse(BaseModel):
     """Health check response"""
+    model_config = RESPONSE_CONFIG
+
     status: str
     database: str
     rooms_count: int
     criteria_count: int
+    recommend_cache_hit_rate: Optional[float] = None
 
 
 class StatsResponse(BaseModel):
     """Statistics response"""
+    model_config = RESPONSE_CONFIG
+
     total_rooms: int
     available_rooms: int
     price_range: Dict[str, float]
@@ -5,15 +5,28 @@ Calculates derived attributes for TOPSIS algorithm
 """
 
 import csv
-import json
+import io
 import re
 import os
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from math import radians, cos, sin, asin, sqrt
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
+import numpy as np
 import psycopg2
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
+from utils.geo import haversine_km
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # Optional dependency, fall back to the stdlib parser
+    from json import loads as json_loads
+
 
 # Load environment variables
 load_dotenv()
@@ -37,14 +50,57 @@ REFERENCE_LOCATION = {
 }
 
 
+# Columns loaded by import_rooms, in COPY order
+ROOM_COLUMNS = (
+    'listing_id', 'name', 'description', 'latitude', 'longitude',
+    'neighbourhood', 'neighbourhood_cleansed', 'property_type', 'room_type',
+    'accommodates', 'bedrooms', 'beds', 'bathrooms', 'price',
+    'minimum_nights', 'maximum_nights', 'host_id', 'host_name',
+    'host_is_superhost', 'host_response_rate', 'number_of_reviews',
+    'review_scores_rating', 'review_scores_accuracy', 'review_scores_cleanliness',
+    'review_scores_checkin', 'review_scores_communication', 'review_scores_location',
+    'review_scores_value', 'availability_365', 'instant_bookable',
+    'amenities', 'listing_url', 'picture_url', 'status', 'last_scraped'
+)
+
+# Source columns read from listings.csv, in the order import_rooms unpacks them
+CSV_FIELDS = (
+    'id', 'name', 'description', 'latitude', 'longitude',
+    'neighbourhood', 'neighbourhood_cleansed', 'property_type', 'room_type',
+    'accommodates', 'bedrooms', 'beds', 'bathrooms_text', 'price',
+    'minimum_nights', 'maximum_nights', 'host_id', 'host_name',
+    'host_is_superhost', 'host_response_rate', 'number_of_reviews',
+    'review_scores_rating', 'review_scores_accuracy', 'review_scores_cleanliness',
+    'review_scores_checkin', 'review_scores_communication', 'review_scores_location',
+    'review_scores_value', 'availability_365', 'instant_bookable',
+    'amenities', 'listing_url', 'picture_url', 'last_scraped'
+)
+
+# Precompiled cleaners for the per-row hot path
+_PRICE_TRANS = str.maketrans('', '', '$,')
+_QUOTE_TRANS = str.maketrans("'", '"')
+_BATH_RE = re.compile(r'(\d+\.?\d*)')
+
+# Rows cleaned per worker task and sent per COPY into the staging table
+COPY_BATCH_SIZE = 10000
+
+# Memory for the sort/hash of the staging -> rooms merge (SET LOCAL, import only)
+MERGE_WORK_MEM = '256MB'
+
+# Processes cleaning CSV rows in parallel (1 = clean in the importing process)
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', os.cpu_count() or 1))
+
+# NULL marker in the COPY CSV stream (unquoted empty fields stay empty strings)
+COPY_NULL = r'\N'
+
+
 def clean_price(price_str: str) -> Optional[float]:
     """Convert price string like '$70.00' to float"""
     if not price_str or price_str == '':
         return None
     try:
-        # Remove $ and commas, then convert to float
-        cleaned = re.sub(r'[$,]', '', price_str)
-        return float(cleaned)
+        # Remove $ and commas (single C-level pass), then convert to float
+        return float(price_str.translate(_PRICE_TRANS))
     except (ValueError, AttributeError):
         return None
 
@@ -90,8 +146,6 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     """
     Calculate distance in kilometers using Haversine formula
     """
-    from math import radians, cos, sin, asin, sqrt
-    
     # Convert to radians
     lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
     
@@ -107,166 +161,306 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return c * r
 
 
+def normalize_for_display(code: str, values: np.ndarray) -> np.ndarray:
+    """
+    Scale a column of attribute values to the 0-1 range used by the room detail
+    radar chart (simplified, stored in room_attributes.normalized_value)
+    """
+    code = code.lower()
+    if code == 'price':
+        return np.minimum(1.0, 1.0 - (values / 1000000))  # Inverse for price
+    elif code.startswith('rating'):
+        return values / 5.0  # Rating 0-5 to 0-1
+    else:
+        return np.minimum(1.0, values / 100.0)  # Generic normalization
+
+
 def count_amenities(amenities_str: str) -> int:
     """Count number of amenities from JSON array string"""
     if not amenities_str:
         return 0
     try:
-        # Parse as JSON array
-        amenities_list = json.loads(amenities_str.replace("'", '"'))
-        return len(amenities_list)
-    except (json.JSONDecodeError, ValueError):
+        # Parse as JSON array; listings exports are already valid JSON
+        return len(json_loads(amenities_str))
+    except ValueError:
+        pass
+    try:
+        # Python-style list with single quotes
+        return len(json_loads(amenities_str.translate(_QUOTE_TRANS)))
+    except ValueError:
         # Fallback: count commas + 1
-        return amenities_str.count(',') + 1 if amenities_str else 0
+        return amenities_str.count(',') + 1
+
+
+def clean_room(fields: Sequence[str]) -> Optional[Tuple]:
+    """
+    Clean one CSV row (source columns in CSV_FIELDS order) into a room tuple
+    with one value per ROOM_COLUMNS entry
+    Returns None for rows without a price or a valid location
+    """
+    (listing_id, name, description, lat_str, lon_str,
+     neighbourhood, neighbourhood_cleansed, property_type, room_type,
+     accommodates, bedrooms, beds, bathrooms_text, price_str,
+     minimum_nights, maximum_nights, host_id, host_name,
+     host_is_superhost, host_response_rate, number_of_reviews,
+     rating, accuracy, cleanliness,
+     checkin, communication, location_rating,
+     value_rating, availability_365, instant_bookable,
+     amenities, listing_url, picture_url, last_scraped_str) = fields
+    
+    # Skip if no price or invalid location
+    price = clean_price(price_str)
+    lat = clean_numeric(lat_str)
+    lon = clean_numeric(lon_str)
+    
+    if not price or not lat or not lon:
+        return None
+    
+    # Parse bathrooms from text like "1 bath" or "1.5 baths"
+    bathrooms = None
+    if bathrooms_text:
+        bath_match = _BATH_RE.search(bathrooms_text)
+        if bath_match:
+            bathrooms = float(bath_match.group(1))
+    
+    availability = clean_integer(availability_365) or 0
+    
+    # Parse last_scraped date
+    last_scraped = None
+    if last_scraped_str:
+        try:
+            last_scraped = datetime.strptime(last_scraped_str, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    
+    # Positional, in ROOM_COLUMNS order
+    return (
+        clean_integer(listing_id),
+        name[:500],  # Limit length
+        description,
+        lat,  # latitude
+        lon,  # longitude
+        neighbourhood,
+        neighbourhood_cleansed,
+        property_type,
+        room_type,
+        clean_integer(accommodates),
+        clean_numeric(bedrooms),
+        clean_integer(beds),
+        bathrooms,
+        price,
+        clean_integer(minimum_nights),
+        clean_integer(maximum_nights),
+        clean_integer(host_id),
+        host_name,
+        clean_boolean(host_is_superhost),
+        host_response_rate,
+        clean_integer(number_of_reviews) or 0,
+        clean_numeric(rating),  # review_scores_rating
+        clean_numeric(accuracy),  # review_scores_accuracy
+        clean_numeric(cleanliness),  # review_scores_cleanliness
+        clean_numeric(checkin),  # review_scores_checkin
+        clean_numeric(communication),  # review_scores_communication
+        clean_numeric(location_rating),  # review_scores_location
+        clean_numeric(value_rating),  # review_scores_value
+        availability,
+        clean_boolean(instant_bookable),
+        amenities,
+        listing_url,
+        picture_url,
+        'AVAILABLE' if availability > 0 else 'INACTIVE',  # status
+        last_scraped,
+    )
+
+
+def clean_rooms_to_csv(chunk: List[Sequence[str]]) -> Tuple[str, int]:
+    """
+    Clean a chunk of CSV rows into COPY-ready CSV text
+    
+    Runs in the worker processes: returning one string instead of the cleaned
+    rows keeps the result cheap to send back to the importing process.
+    Returns: (csv_text, number_of_rooms)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for fields in chunk:
+        room = clean_room(fields)
+        if room is None:
+            continue
+        writer.writerow([COPY_NULL if value is None else value for value in room])
+        count += 1
+    return buffer.getvalue(), count
+
+
+def copy_rooms_to_staging(cursor, csv_text: str):
+    """COPY a batch of cleaned rooms (CSV text) into the rooms_staging table"""
+    cursor.copy_expert(
+        f"COPY rooms_staging ({', '.join(ROOM_COLUMNS)}) FROM STDIN WITH (FORMAT CSV, NULL '{COPY_NULL}')",
+        io.StringIO(csv_text)
+    )
 
 
 def import_rooms(csv_file_path: str, conn) -> List[int]:
     """
     Import rooms from CSV file
+    
+    Cleaned rows are streamed with COPY into a temporary staging table, then
+    merged into rooms with a single INSERT ... ON CONFLICT.
     Returns list of room_ids
     """
     print(f"📥 Importing rooms from {csv_file_path}...")
     
     cursor = conn.cursor()
-    room_ids = []
+    columns = ', '.join(ROOM_COLUMNS)
     
-    insert_query = """
-        INSERT INTO rooms (
-            listing_id, name, description, latitude, longitude,
-            neighbourhood, neighbourhood_cleansed, property_type, room_type,
-            accommodates, bedrooms, beds, bathrooms, price,
-            minimum_nights, maximum_nights, host_id, host_name,
-            host_is_superhost, host_response_rate, number_of_reviews,
-            review_scores_rating, review_scores_accuracy, review_scores_cleanliness,
-            review_scores_checkin, review_scores_communication, review_scores_location,
-            review_scores_value, availability_365, instant_bookable,
-            amenities, listing_url, picture_url, status, last_scraped
-        ) VALUES (
-            %(listing_id)s, %(name)s, %(description)s, %(latitude)s, %(longitude)s,
-            %(neighbourhood)s, %(neighbourhood_cleansed)s, %(property_type)s, %(room_type)s,
-            %(accommodates)s, %(bedrooms)s, %(beds)s, %(bathrooms)s, %(price)s,
-            %(minimum_nights)s, %(maximum_nights)s, %(host_id)s, %(host_name)s,
-            %(host_is_superhost)s, %(host_response_rate)s, %(number_of_reviews)s,
-            %(review_scores_rating)s, %(review_scores_accuracy)s, %(review_scores_cleanliness)s,
-            %(review_scores_checkin)s, %(review_scores_communication)s, %(review_scores_location)s,
-            %(review_scores_value)s, %(availability_365)s, %(instant_bookable)s,
-            %(amenities)s, %(listing_url)s, %(picture_url)s, %(status)s, %(last_scraped)s
-        )
+    # The whole import is one transaction that can be re-run, so it doesn't
+    # need to wait for the WAL flush at commit
+    cursor.execute("SET LOCAL synchronous_commit = OFF")
+    
+    # Same columns as rooms (no defaults/sequence), dropped when the import commits
+    cursor.execute(f"""
+        CREATE TEMP TABLE rooms_staging ON COMMIT DROP AS
+        SELECT {columns} FROM rooms WITH NO DATA
+    """)
+    
+    staged = 0
+    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
+        # Plain csv.reader + one itemgetter per row: no per-row header dict
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        missing = [name for name in CSV_FIELDS if name not in header]
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+        get_fields = itemgetter(*(header.index(name) for name in CSV_FIELDS))
+        
+        # Only the needed fields are sent to the workers
+        chunks = iter(lambda: [get_fields(row) for row in islice(reader, COPY_BATCH_SIZE)], [])
+        
+        def stage(result):
+            nonlocal staged
+            csv_text, count = result
+            if count:
+                copy_rooms_to_staging(cursor, csv_text)
+                staged += count
+                print(f"  ✓ Staged {staged} rooms...")
+        
+        if IMPORT_WORKERS <= 1:
+            for chunk in chunks:
+                stage(clean_rooms_to_csv(chunk))
+        else:
+            # Clean chunks in parallel, COPY them here in file order; at most
+            # two chunks per worker are in flight to bound memory
+            with ProcessPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(clean_rooms_to_csv, chunk))
+                    if len(pending) >= 2 * IMPORT_WORKERS:
+                        stage(pending.popleft().result())
+                while pending:
+                    stage(pending.popleft().result())
+    
+    # Merge into rooms in one statement. A listing appearing twice in the CSV
+    # keeps its last row (ON CONFLICT can't touch the same row twice).
+    cursor.execute(f"SET LOCAL work_mem = '{MERGE_WORK_MEM}'")
+    cursor.execute(f"""
+        INSERT INTO rooms ({columns})
+        SELECT DISTINCT ON (listing_id) {columns}
+        FROM rooms_staging
+        ORDER BY listing_id, ctid DESC
         ON CONFLICT (listing_id) DO UPDATE SET
             name = EXCLUDED.name,
             price = EXCLUDED.price,
             availability_365 = EXCLUDED.availability_365,
             updated_at = CURRENT_TIMESTAMP
-        RETURNING room_id;
+        RETURNING room_id
+    """)
+    room_ids = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    
+    cursor.close()
+    print(f"✅ Imported {len(room_ids)} rooms total ({staged} rows staged)!")
+    return room_ids
+
+
+def build_attribute_rows(rooms: List[Tuple], criteria: List[Tuple]) -> List[Tuple]:
     """
+    Calculate (room_id, criterion_id, value, normalized_value) rows for a batch of rooms
     
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        rows_to_insert = []
-        
-        for row in reader:
-            # Skip if no price or invalid location
-            price = clean_price(row.get('price', ''))
-            lat = clean_numeric(row.get('latitude', ''))
-            lon = clean_numeric(row.get('longitude', ''))
-            
-            if not price or not lat or not lon:
-                continue
-            
-            # Parse bathrooms from text like "1 bath" or "1.5 baths"
-            bathrooms_text = row.get('bathrooms_text', '')
-            bathrooms = None
-            if bathrooms_text:
-                bath_match = re.search(r'(\d+\.?\d*)', bathrooms_text)
-                if bath_match:
-                    bathrooms = float(bath_match.group(1))
-            
-            # Parse last_scraped date
-            last_scraped = None
-            if row.get('last_scraped'):
-                try:
-                    last_scraped = datetime.strptime(row['last_scraped'], '%Y-%m-%d').date()
-                except ValueError:
-                    pass
-            
-            room_data = {
-                'listing_id': clean_integer(row.get('id', '')),
-                'name': row.get('name', '')[:500],  # Limit length
-                'description': row.get('description', ''),
-                'latitude': lat,
-                'longitude': lon,
-                'neighbourhood': row.get('neighbourhood', ''),
-                'neighbourhood_cleansed': row.get('neighbourhood_cleansed', ''),
-                'property_type': row.get('property_type', ''),
-                'room_type': row.get('room_type', ''),
-                'accommodates': clean_integer(row.get('accommodates', '')),
-                'bedrooms': clean_numeric(row.get('bedrooms', '')),
-                'beds': clean_integer(row.get('beds', '')),
-                'bathrooms': bathrooms,
-                'price': price,
-                'minimum_nights': clean_integer(row.get('minimum_nights', '')),
-                'maximum_nights': clean_integer(row.get('maximum_nights', '')),
-                'host_id': clean_integer(row.get('host_id', '')),
-                'host_name': row.get('host_name', ''),
-                'host_is_superhost': clean_boolean(row.get('host_is_superhost', 'f')),
-                'host_response_rate': row.get('host_response_rate', ''),
-                'number_of_reviews': clean_integer(row.get('number_of_reviews', '0')) or 0,
-                'review_scores_rating': clean_numeric(row.get('review_scores_rating', '')),
-                'review_scores_accuracy': clean_numeric(row.get('review_scores_accuracy', '')),
-                'review_scores_cleanliness': clean_numeric(row.get('review_scores_cleanliness', '')),
-                'review_scores_checkin': clean_numeric(row.get('review_scores_checkin', '')),
-                'review_scores_communication': clean_numeric(row.get('review_scores_communication', '')),
-                'review_scores_location': clean_numeric(row.get('review_scores_location', '')),
-                'review_scores_value': clean_numeric(row.get('review_scores_value', '')),
-                'availability_365': clean_integer(row.get('availability_365', '0')) or 0,
-                'instant_bookable': clean_boolean(row.get('instant_bookable', 'f')),
-                'amenities': row.get('amenities', ''),
-                'listing_url': row.get('listing_url', ''),
-                'picture_url': row.get('picture_url', ''),
-                'status': 'AVAILABLE' if clean_integer(row.get('availability_365', '0')) > 0 else 'INACTIVE',
-                'last_scraped': last_scraped
-            }
-            
-            rows_to_insert.append(room_data)
-            
-            # Batch insert every 100 rows
-            if len(rows_to_insert) >= 100:
-                for room in rows_to_insert:
-                    cursor.execute(insert_query, room)
-                    room_id = cursor.fetchone()[0]
-                    room_ids.append(room_id)
-                conn.commit()
-                print(f"  ✓ Imported {len(room_ids)} rooms...")
-                rows_to_insert = []
+    Rooms are transposed into one float64 array per column (NULL -> NaN) so
+    attributes are computed column-wise instead of row by row.
+    """
+    (room_ids, prices, lats, lons, ratings, cleanliness, location_ratings,
+     value_ratings, accommodates, amenities) = zip(*rooms)
+    
+    def column(values):
+        return np.array(values, dtype=np.float64)
+    
+    # Map criteria codes to value columns
+    columns = {
+        'PRICE': column(prices),
+        'DISTANCE_CENTER': haversine_km(
+            REFERENCE_LOCATION['lat'], REFERENCE_LOCATION['lon'], column(lats), column(lons)
+        ),
+        'RATING_OVERALL': column(ratings),
+        'RATING_CLEANLINESS': column(cleanliness),
+        'RATING_LOCATION': column(location_ratings),
+        'RATING_VALUE': column(value_ratings),
+        'ACCOMMODATES': column(accommodates),
+        'AMENITIES_COUNT': np.fromiter(map(count_amenities, amenities), dtype=np.float64, count=len(amenities)),
+    }
+    
+    attribute_rows = []
+    
+    for criterion_id, code in criteria:
+        values = columns.get(code)
+        if values is None:
+            continue
         
-        # Insert remaining rows
-        if rows_to_insert:
-            for room in rows_to_insert:
-                cursor.execute(insert_query, room)
-                room_id = cursor.fetchone()[0]
-                room_ids.append(room_id)
-            conn.commit()
+        # Only insert if value exists
+        present = ~np.isnan(values)
+        attribute_rows.extend(
+            (room_id, criterion_id, value, normalized)
+            for room_id, value, normalized, ok in zip(
+                room_ids, values.tolist(), normalize_for_display(code, values).tolist(), present.tolist()
+            )
+            if ok
+        )
     
-    cursor.close()
-    print(f"✅ Imported {len(room_ids)} rooms total!")
-    return room_ids
+    return attribute_rows
 
 
 def calculate_and_insert_attributes(conn):
     """
     Calculate attribute values for all rooms based on criteria
     This populates the room_attributes table (Decision Matrix)
+    
+    Rooms are read through a server-side cursor and written back one batch
+    at a time, so memory stays flat however large the rooms table is.
     """
     print(f"🔢 Calculating room attributes...")
     
     cursor = conn.cursor()
+    cursor.execute("SET LOCAL synchronous_commit = OFF")
     
     # Get all criteria
     cursor.execute("SELECT criterion_id, code FROM criteria WHERE is_active = TRUE")
     criteria = cursor.fetchall()
     
-    # Get all rooms
-    cursor.execute("""
+    # One multi-row VALUES statement per page instead of one INSERT per row
+    insert_query = """
+        INSERT INTO room_attributes (room_id, criterion_id, value, normalized_value)
+        VALUES %s
+        ON CONFLICT (room_id, criterion_id) DO UPDATE SET
+            value = EXCLUDED.value,
+            normalized_value = EXCLUDED.normalized_value,
+            calculated_at = CURRENT_TIMESTAMP
+    """
+    
+    # Scan rooms with a named (server-side) cursor; writes go through `cursor`
+    rooms_cursor = conn.cursor(name='rooms_scan')
+    rooms_cursor.itersize = COPY_BATCH_SIZE
+    rooms_cursor.execute("""
         SELECT room_id, price, latitude, longitude, 
                review_scores_rating, review_scores_cleanliness, 
                review_scores_location, review_scores_value,
@@ -274,51 +468,35 @@ def calculate_and_insert_attributes(conn):
         FROM rooms
         WHERE status = 'AVAILABLE'
     """)
-    rooms = cursor.fetchall()
     
-    attributes_to_insert = []
-    
-    for room in rooms:
-        room_id, price, lat, lon, rating, cleanliness, location_rating, value_rating, accommodates, amenities = room
-        
-        # Calculate distance to city center
-        distance = calculate_distance(lat, lon, REFERENCE_LOCATION['lat'], REFERENCE_LOCATION['lon'])
+    inserted = 0
+    while True:
+        rooms = rooms_cursor.fetchmany(COPY_BATCH_SIZE)
+        if not rooms:
+            break
         
-        # Count amenities
-        amenities_count = count_amenities(amenities)
-        
-        # Map criteria codes to values
-        values_map = {
-            'PRICE': price,
-            'DISTANCE_CENTER': distance,
-            'RATING_OVERALL': rating,
-            'RATING_CLEANLINESS': cleanliness,
-            'RATING_LOCATION': location_rating,
-            'RATING_VALUE': value_rating,
-            'ACCOMMODATES': accommodates,
-            'AMENITIES_COUNT': amenities_count
-        }
-        
-        # Insert attributes
-        for criterion_id, code in criteria:
-            value = values_map.get(code)
-            if value is not None:  # Only insert if value exists
-                attributes_to_insert.append((room_id, criterion_id, value))
-    
-    # Batch insert attributes
-    if attributes_to_insert:
-        insert_query = """
-            INSERT INTO room_attributes (room_id, criterion_id, value)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (room_id, criterion_id) DO UPDATE SET
-                value = EXCLUDED.value,
-                calculated_at = CURRENT_TIMESTAMP
-        """
-        execute_batch(cursor, insert_query, attributes_to_insert, page_size=1000)
-        conn.commit()
+        attribute_rows = build_attribute_rows(rooms, criteria)
+        if attribute_rows:
+            execute_values(cursor, insert_query, attribute_rows,
+                           template="(%s, %s, %s, %s)", page_size=COPY_BATCH_SIZE)
+            inserted += len(attribute_rows)
     
+    rooms_cursor.close()
+    conn.commit()
+    
+    cursor.close()
+    print(f"✅ Calculated {inserted} attributes!")
+
+
+def refresh_summary_views(conn):
+    """Refresh materialized views derived from the rooms table"""
+    print("🔄 Refreshing summary views...")
+    cursor = conn.cursor()
+    # CONCURRENTLY keeps /stats readable during the refresh (needs the unique index)
+    cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_room_type_counts")
+    conn.commit()
     cursor.close()
-    print(f"✅ Calculated {len(attributes_to_insert)} attributes!")
+    print("✅ Summary views refreshed!")
 
 
 def print_statistics(conn):
@@ -398,6 +576,9 @@ def main():
         # Calculate attributes
         calculate_and_insert_attributes(conn)
         
+        # Refresh /stats aggregates
+        refresh_summary_views(conn)
+        
         # Print statistics
         print_statistics(conn)
         
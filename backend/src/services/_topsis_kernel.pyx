@@ -0,0 +1,70 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+# distutils: extra_compile_args = -O3 -fopenmp
+# distutils: extra_link_args = -fopenmp
+"""
+Compiled TOPSIS kernel (optional, built by `make build-ext`)
+
+Same steps as TOPSISEngine._topsis_core on a float32 matrix; the row loop
+runs without the GIL, split across OpenMP threads.
+"""
+
+from cython.parallel cimport prange
+from libc.math cimport sqrt
+
+
+def topsis(const float[:, ::1] matrix, const float[::1] weights, const unsigned char[::1] is_benefit,
+           float[:, ::1] weighted, float[::1] distance_to_best, float[::1] distance_to_worst,
+           float[::1] scores):
+    """Fill the weighted matrix, both distances and the closeness scores"""
+    cdef Py_ssize_t m = matrix.shape[0], n = matrix.shape[1]
+    cdef Py_ssize_t i, j
+    cdef double sum_of_squares, norm, scale, value, column_max, column_min
+    cdef double to_best, to_worst, diff, denominator
+    cdef float[::1] ideal_best = weights.copy()
+    cdef float[::1] ideal_worst = weights.copy()
+
+    # Normalize + weight one column at a time, tracking its max/min
+    for j in range(n):
+        sum_of_squares = 0.0
+        for i in range(m):
+            sum_of_squares = sum_of_squares + matrix[i, j] * matrix[i, j]
+        norm = sqrt(sum_of_squares)
+        if norm == 0:
+            norm = 1.0
+        scale = weights[j] / norm
+
+        column_max = matrix[0, j] * scale if m else 0.0
+        column_min = column_max
+        for i in range(m):
+            value = matrix[i, j] * scale
+            weighted[i, j] = <float>value
+            if value > column_max:
+                column_max = value
+            if value < column_min:
+                column_min = value
+
+        if is_benefit[j]:
+            ideal_best[j] = <float>column_max
+            ideal_worst[j] = <float>column_min
+        else:
+            ideal_best[j] = <float>column_min
+            ideal_worst[j] = <float>column_max
+
+    # Distances and closeness, rows in parallel
+    for i in prange(m, nogil=True, schedule='static'):
+        to_best = 0.0
+        to_worst = 0.0
+        for j in range(n):
+            diff = weighted[i, j] - ideal_best[j]
+            to_best = to_best + diff * diff
+            diff = weighted[i, j] - ideal_worst[j]
+            to_worst = to_worst + diff * diff
+        to_best = sqrt(to_best)
+        to_worst = sqrt(to_worst)
+        distance_to_best[i] = <float>to_best
+        distance_to_worst[i] = <float>to_worst
+
+        denominator = to_best + to_worst
+        if denominator == 0:
+            denominator = 1.0
+        scores[i] = <float>(to_worst / denominator)
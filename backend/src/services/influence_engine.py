@@ -3,26 +3,124 @@ Influence Diagram Engine
 Converts user preferences to criterion weights using influence diagram structure
 """
 
-from typing import Dict, List, Tuple
-import psycopg2
+import sys
+import time
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+
+# New (direct) preference format: criterion code -> ((preference key, factor), ...)
+# Note: view_importance is distributed across RATING_OVERALL and RATING_LOCATION
+# since VIEW_QUALITY criterion may not exist in all databases
+DIRECT_PREFERENCE_WEIGHTS = (
+    ('PRICE', (('price_sensitivity', 1.0),)),
+    ('RATING_OVERALL', (('comfort_priority', 0.4), ('view_importance', 0.3))),
+    ('RATING_CLEANLINESS', (('cleanliness_priority', 1.0),)),
+    ('RATING_LOCATION', (('distance_tolerance', 1.0), ('view_importance', 0.2))),
+    ('DISTANCE_CENTER', (('distance_tolerance', 0.3),)),
+    ('AMENITIES_COUNT', (('comfort_priority', 0.3), ('view_importance', 0.1))),
+)
 
 
 class InfluenceEngine:
     """
     Processes user preferences through the Influence Diagram
     to calculate final criterion weights
+    
+    The engine holds no connection: one instance can be shared across requests,
+    and methods that may need the database take a connection per call.
     """
     
-    def __init__(self, db_connection):
-        self.conn = db_connection
+    # Seconds a loaded influence diagram is reused before it is read again
+    STRUCTURE_TTL = 300
+    
+    def __init__(self, criteria: Optional[Dict[str, Dict]] = None,
+                 structure: Optional[Tuple[Dict, Dict]] = None):
+        """
+        Args:
+            criteria: optional preloaded criteria rows keyed by code; when given,
+                      criterion metadata is read from it instead of the database
+            structure: optional preloaded (nodes, edges) influence diagram
+        """
+        self.criteria = criteria
+        # (nodes, edges, criterion_codes, code_to_idx), swapped as one tuple so
+        # concurrent readers never mix an old diagram with a new index
+        self._structure_state = None
+        self._structure_loaded_at = None
+        if structure is not None:
+            self._set_structure(structure)
+    
+    @classmethod
+    def build_from_db(cls, conn, criteria: Optional[Dict[str, Dict]] = None) -> 'InfluenceEngine':
+        """
+        Create an engine with the criteria and influence diagram preloaded
+        
+        Args:
+            conn: psycopg2 connection, only used while building
+            criteria: criteria rows keyed by code, loaded from the database if omitted
+        """
+        if criteria is None:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("SELECT * FROM criteria")
+            criteria = {row['code']: dict(row) for row in cursor.fetchall()}
+            cursor.close()
+        
+        return cls(criteria=criteria, structure=cls.load_influence_structure(conn))
+    
+    def get_influence_structure(self, conn=None) -> Tuple[Dict, Dict]:
+        """
+        Influence diagram structure, cached on the engine
+        
+        The cached structure is reused for STRUCTURE_TTL seconds, then reloaded
+        through `conn` on the next call that passes one. Without a connection an
+        expired structure keeps being served (see refresh_structure()).
+        Returns: (nodes_dict, edges_dict)
+        """
+        return self._get_structure_state(conn)[:2]
+    
+    def refresh_structure(self, conn) -> Tuple[Dict, Dict]:
+        """Reload the influence diagram into the cache and return it"""
+        return self._set_structure(self.load_influence_structure(conn))[:2]
     
-    def get_influence_structure(self) -> Tuple[Dict, Dict]:
+    def _get_structure_state(self, conn=None) -> Tuple:
+        """Cached structure plus criterion index, (re)loaded through `conn` if needed"""
+        state = self._structure_state
+        if state is None:
+            if conn is None:
+                raise ValueError("A database connection is required to load the influence diagram")
+            return self._set_structure(self.load_influence_structure(conn))
+        
+        if conn is not None and time.monotonic() - self._structure_loaded_at > self.STRUCTURE_TTL:
+            return self._set_structure(self.load_influence_structure(conn))
+        
+        return state
+    
+    def _set_structure(self, structure: Tuple[Dict, Dict]) -> Tuple:
+        """Cache a (nodes, edges) structure with a fixed slot per mapped criterion"""
+        nodes, edges = structure
+        criterion_codes = list(dict.fromkeys(
+            edge['criterion_code']
+            for parent_edges in edges.values()
+            for edge in parent_edges
+            if edge['criterion_code']
+        ))
+        code_to_idx = {code: idx for idx, code in enumerate(criterion_codes)}
+        
+        state = (nodes, edges, criterion_codes, code_to_idx)
+        self._structure_state = state
+        self._structure_loaded_at = time.monotonic()
+        return state
+    
+    @staticmethod
+    def load_influence_structure(conn) -> Tuple[Dict, Dict]:
         """
         Load the influence diagram structure from database
         Returns: (nodes_dict, edges_dict)
         """
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         # Load all nodes
         cursor.execute("""
@@ -31,7 +129,8 @@ class InfluenceEngine:
             WHERE is_active = TRUE
             ORDER BY display_order
         """)
-        nodes = {row['node_code']: dict(row) for row in cursor.fetchall()}
+        # Codes are interned: the same few strings are looked up on every request
+        nodes = {sys.intern(row['node_code']): dict(row) for row in cursor.fetchall()}
         
         # Load all edges with criterion mappings
         cursor.execute("""
@@ -51,15 +150,19 @@ class InfluenceEngine:
         # Organize edges by parent
         edges = {}
         for row in cursor.fetchall():
-            parent = row['parent_code']
+            edge = dict(row)
+            parent = edge['parent_code'] = sys.intern(edge['parent_code'])
+            edge['child_code'] = sys.intern(edge['child_code'])
+            if edge['criterion_code']:
+                edge['criterion_code'] = sys.intern(edge['criterion_code'])
             if parent not in edges:
                 edges[parent] = []
-            edges[parent].append(dict(row))
+            edges[parent].append(edge)
         
         cursor.close()
         return nodes, edges
     
-    def calculate_weights(self, user_preferences: Dict[str, float]) -> Dict[str, float]:
+    def calculate_weights(self, user_preferences: Dict[str, float], conn=None) -> Dict[str, float]:
         """
         Calculate criterion weights from user preferences
         
@@ -69,6 +172,7 @@ class InfluenceEngine:
                 'comfort_importance': 0.9,
                 'value_importance': 0.6
             }
+            conn: psycopg2 connection, only needed if the structure isn't preloaded
         
         Returns:
             Dict mapping criterion codes to weights, e.g.:
@@ -79,34 +183,25 @@ class InfluenceEngine:
                 ...
             }
         """
-        nodes, edges = self.get_influence_structure()
+        nodes, edges, criterion_codes, code_to_idx = self._get_structure_state(conn)
         
         # Map user preferences to intermediate nodes or directly to criteria
         # Support both legacy and new format
         
         # Check if using new direct preference format
         if 'price_sensitivity' in user_preferences:
-            # New format: map directly to criteria weights
-            # Note: view_importance is distributed across RATING_OVERALL and RATING_LOCATION
-            # since VIEW_QUALITY criterion may not exist in all databases
-            view_weight = user_preferences.get('view_importance', 0.5)
-            comfort_weight = user_preferences.get('comfort_priority', 0.5)
-            
-            raw_weights = {
-                'PRICE': user_preferences.get('price_sensitivity', 0.5),
-                'RATING_OVERALL': comfort_weight * 0.4 + view_weight * 0.3,
-                'RATING_CLEANLINESS': user_preferences.get('cleanliness_priority', 0.5),
-                'RATING_LOCATION': user_preferences.get('distance_tolerance', 0.5) + view_weight * 0.2,
-                'DISTANCE_CENTER': user_preferences.get('distance_tolerance', 0.5) * 0.3,
-                'AMENITIES_COUNT': comfort_weight * 0.3 + view_weight * 0.1,
-            }
+            # New format: map directly to criteria weights (missing preferences count as 0.5)
+            raw_weights = [
+                sum(user_preferences.get(key, 0.5) * factor for key, factor in terms)
+                for _, terms in DIRECT_PREFERENCE_WEIGHTS
+            ]
             
             # Normalize to sum to 1.0
-            total = sum(raw_weights.values())
+            total = sum(raw_weights)
             if total > 0:
-                return {k: v/total for k, v in raw_weights.items()}
+                return {code: weight / total for (code, _), weight in zip(DIRECT_PREFERENCE_WEIGHTS, raw_weights)}
             else:
-                return {k: 1.0/len(raw_weights) for k in raw_weights.keys()}
+                return {code: 1.0 / len(DIRECT_PREFERENCE_WEIGHTS) for code, _ in DIRECT_PREFERENCE_WEIGHTS}
         
         # Legacy format: use intermediate nodes
         intermediate_weights = {
@@ -120,8 +215,10 @@ class InfluenceEngine:
         if total > 0:
             intermediate_weights = {k: v/total for k, v in intermediate_weights.items()}
         
-        # Calculate final criterion weights by propagating through the tree
-        criterion_weights = {}
+        # Calculate final criterion weights by propagating through the tree,
+        # accumulating into one fixed slot per criterion
+        accumulator = np.zeros(len(criterion_codes))
+        reached = np.zeros(len(criterion_codes), dtype=bool)
         
         for parent_code, parent_weight in intermediate_weights.items():
             if parent_code not in edges:
@@ -130,40 +227,41 @@ class InfluenceEngine:
             # For each child of this intermediate node
             for edge in edges[parent_code]:
                 if edge['criterion_code']:  # This is a leaf node mapped to a criterion
-                    criterion_code = edge['criterion_code']
-                    edge_weight = float(edge['weight_factor'])
-                    
-                    # Weight = parent_weight × edge_weight
-                    contribution = parent_weight * edge_weight
+                    idx = code_to_idx[edge['criterion_code']]
                     
-                    # Accumulate (in case multiple paths lead to same criterion)
-                    if criterion_code in criterion_weights:
-                        criterion_weights[criterion_code] += contribution
-                    else:
-                        criterion_weights[criterion_code] = contribution
+                    # Weight = parent_weight × edge_weight, accumulated in case
+                    # multiple paths lead to the same criterion
+                    accumulator[idx] += parent_weight * float(edge['weight_factor'])
+                    reached[idx] = True
         
         # Normalize to sum = 1.0
-        total = sum(criterion_weights.values())
+        total = accumulator.sum()
         if total > 0:
-            criterion_weights = {k: v/total for k, v in criterion_weights.items()}
+            accumulator /= total
         
-        return criterion_weights
+        return {
+            code: weight
+            for code, weight, hit in zip(criterion_codes, accumulator.tolist(), reached.tolist())
+            if hit
+        }
     
-    def explain_weights(self, criterion_weights: Dict[str, float]) -> List[Dict]:
+    def explain_weights(self, criterion_weights: Dict[str, float], conn=None) -> List[Dict]:
         """
         Generate human-readable explanation of weight calculation
+        
+        `conn` is only needed if the criteria aren't preloaded; they are then
+        loaded once in a single query and kept on the engine.
         """
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        if self.criteria is None:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("SELECT code, name, description, unit FROM criteria")
+            self.criteria = {row['code']: dict(row) for row in cursor.fetchall()}
+            cursor.close()
         
         explanations = []
-        for criterion_code, weight in sorted(criterion_weights.items(), key=lambda x: x[1], reverse=True):
-            cursor.execute("""
-                SELECT name, description, unit
-                FROM criteria
-                WHERE code = %s
-            """, (criterion_code,))
+        for criterion_code, weight in sorted(criterion_weights.items(), key=itemgetter(1), reverse=True):
+            criterion = self.criteria.get(criterion_code)
             
-            criterion = cursor.fetchone()
             if criterion:
                 explanations.append({
                     'criterion_code': criterion_code,
@@ -174,7 +272,6 @@ class InfluenceEngine:
                     'unit': criterion['unit']
                 })
         
-        cursor.close()
         return explanations
 
 
@@ -185,17 +282,21 @@ def example_usage():
     
     load_dotenv()
     
-    # Connect to database
-    conn = psycopg2.connect(
+    # Borrow connections from a pool, as the API does (src/api/database.py):
+    # the engines hold no connection, so each call can use any pooled one
+    pool = ThreadedConnectionPool(
+        minconn=1,
+        maxconn=int(os.getenv('DB_POOL_MAX', '10')),
         dbname=os.getenv('DB_NAME', 'stayhub'),
         user=os.getenv('DB_USER', 'stayhub_user'),
         password=os.getenv('DB_PASSWORD', 'stayhub_password'),
         host=os.getenv('DB_HOST', 'localhost'),
         port=os.getenv('DB_PORT', '5432')
     )
+    conn = pool.getconn()
     
     # Create engine
-    engine = InfluenceEngine(conn)
+    engine = InfluenceEngine.build_from_db(conn)
     
     # User preferences (0-1 scale, where 1 = most important)
     user_prefs = {
@@ -217,7 +318,8 @@ def example_usage():
         print(f"{exp['criterion_name']:30s} {exp['weight']:.4f} ({exp['weight_percent']:.1f}%)")
     print("="*60 + "\n")
     
-    conn.close()
+    pool.putconn(conn)
+    pool.closeall()
 
 
 if __name__ == '__main__':
@@ -3,90 +3,223 @@ TOPSIS (Technique for Order Preference by Similarity to Ideal Solution) Engine
 Implements the TOPSIS algorithm for multi-criteria decision making
 """
 
+import inspect
+import math
+from functools import lru_cache
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+try:
+    # Cython kernel from `make build-ext` (row loop runs without the GIL)
+    from ._topsis_kernel import topsis as _topsis_compiled
+    HAS_COMPILED_KERNEL = True
+except ImportError:  # Extension not built, or run as a script
+    HAS_COMPILED_KERNEL = False
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # Optional dependency, fall back to plain NumPy
+    HAS_NUMBA = False
+
+
+@lru_cache(maxsize=None)
+def _make_kernel(n_criteria: int):
+    """
+    TOPSIS steps 1-5 as plain loops for a fixed number of criteria, writing
+    into the preallocated outputs
+    
+    One kernel is built per criterion count. Numba freezes `n_criteria` as a
+    compile-time constant, so the short per-row loops over the criteria are
+    fully unrolled. Compiled only when HAS_TOPSIS_KERNEL is set.
+    """
+    def topsis_kernel(matrix, weights, is_benefit, weighted, ideal_best, ideal_worst,
+                      distance_to_best, distance_to_worst, scores):
+        m = matrix.shape[0]
+        
+        # Normalize + weight one column at a time, tracking its max/min
+        for j in range(n_criteria):
+            sum_of_squares = 0.0
+            for i in range(m):
+                sum_of_squares += matrix[i, j] * matrix[i, j]
+            norm = math.sqrt(sum_of_squares)
+            if norm == 0:
+                norm = 1.0
+            scale = weights[j] / norm
+        
+            column_max = -math.inf
+            column_min = math.inf
+            for i in range(m):
+                value = matrix[i, j] * scale
+                weighted[i, j] = value
+                column_max = max(column_max, value)
+                column_min = min(column_min, value)
+        
+            if is_benefit[j]:
+                ideal_best[j] = column_max
+                ideal_worst[j] = column_min
+            else:
+                ideal_best[j] = column_min
+                ideal_worst[j] = column_max
+        
+        # Distances and closeness, one row at a time
+        for i in range(m):
+            to_best = 0.0
+            to_worst = 0.0
+            for j in range(n_criteria):
+                diff = weighted[i, j] - ideal_best[j]
+                to_best += diff * diff
+                diff = weighted[i, j] - ideal_worst[j]
+                to_worst += diff * diff
+            to_best = math.sqrt(to_best)
+            to_worst = math.sqrt(to_worst)
+            distance_to_best[i] = to_best
+            distance_to_worst[i] = to_worst
+        
+            denominator = to_best + to_worst
+            if denominator == 0:
+                denominator = 1.0
+            scores[i] = to_worst / denominator
+    
+    if HAS_TOPSIS_KERNEL:
+        return njit(fastmath=True)(topsis_kernel)
+    return topsis_kernel
+
+
+# Serial and without cache=True, like utils.geo. Only jitted while this module
+# is plain Python: `make build-ext` turns it into Cython functions, which Numba
+# can't compile, and the NumPy path is used instead.
+HAS_TOPSIS_KERNEL = HAS_NUMBA and inspect.isfunction(_make_kernel.__wrapped__)
 
 
 class TOPSISEngine:
     """
     Implements TOPSIS algorithm for ranking alternatives
+    
+    The engine holds no connection: one instance can be shared across requests,
+    and methods reading the database take a connection per call.
     """
     
-    def __init__(self, db_connection):
-        self.conn = db_connection
+    # Above this many rooms the decision matrix is read through a server-side cursor
+    SERVER_CURSOR_MIN_ROOMS = 2000
     
-    def get_decision_matrix(self, room_ids: List[int], criterion_codes: List[str]) -> Tuple[np.ndarray, List[int], List[str]]:
+    # Attribute rows fetched per round trip while building the decision matrix
+    FETCH_BATCH_SIZE = 2000
+    
+    # Opening of the explanation, indexed by rank (ranks past the end get none)
+    EXPLANATION_LEADS = (None, "Best overall match") + ("Excellent choice",) * 2 + ("Good option",) * 7
+    
+    def __init__(self, criteria: Optional[Dict[str, Dict]] = None):
+        """
+        Args:
+            criteria: optional preloaded criteria rows keyed by code; when given,
+                      criterion metadata is read from it instead of the database
+        """
+        self.criteria = criteria
+    
+    @classmethod
+    def build_from_db(cls, conn) -> 'TOPSISEngine':
+        """Create an engine with the criteria table preloaded"""
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("SELECT * FROM criteria")
+        criteria = {row['code']: dict(row) for row in cursor.fetchall()}
+        cursor.close()
+        return cls(criteria=criteria)
+    
+    def _load_criteria(self, conn) -> Dict[str, Dict]:
+        """Criteria rows keyed by code, read once per engine if not preloaded"""
+        if self.criteria is None:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("SELECT criterion_id, code, is_benefit, name, unit, display_order FROM criteria")
+            self.criteria = {row['code']: dict(row) for row in cursor.fetchall()}
+            cursor.close()
+        return self.criteria
+    
+    def get_decision_matrix(self, conn, room_ids: List[int], criterion_codes: List[str]) -> Tuple[np.ndarray, List[int], List[str]]:
         """
         Retrieve decision matrix from database
         
         Returns:
-            - matrix: numpy array of shape (m_rooms, n_criteria)
+            - matrix: float32 numpy array of shape (m_rooms, n_criteria)
             - room_ids_ordered: list of room_ids in matrix row order
             - criterion_codes_ordered: list of criterion codes in matrix column order
         """
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        # Criterion ids come from the cached criteria, so the query reads
+        # room_attributes alone instead of joining criteria on every request
+        criteria = self._load_criteria(conn)
+        id_index = {
+            criteria[code]['criterion_id']: j
+            for j, code in enumerate(criterion_codes)
+            if code in criteria
+        }
+        
+        # Large candidate sets are streamed through a server-side cursor so the
+        # rows never sit in memory all at once
+        cursor_name = 'decision_matrix' if len(room_ids) > self.SERVER_CURSOR_MIN_ROOMS else None
+        cursor = conn.cursor(name=cursor_name, cursor_factory=RealDictCursor)
         
         # Build query to get all attributes
-        room_ids_str = ','.join(map(str, room_ids))
-        criterion_codes_str = ','.join([f"'{code}'" for code in criterion_codes])
-        
-        cursor.execute(f"""
+        # room_ids and criterion ids are bound as arrays so the statement text never
+        # changes; no ORDER BY, rows are placed into the matrix by index below
+        cursor.execute("""
             SELECT 
-                ra.room_id,
-                c.code as criterion_code,
-                ra.value
-            FROM room_attributes ra
-            JOIN criteria c ON ra.criterion_id = c.criterion_id
-            WHERE ra.room_id IN ({room_ids_str})
-              AND c.code IN ({criterion_codes_str})
-            ORDER BY ra.room_id, c.display_order
-        """)
-        
-        rows = cursor.fetchall()
-        
-        # Organize data into matrix
-        data_dict = {}
-        for row in rows:
-            room_id = row['room_id']
-            code = row['criterion_code']
-            value = float(row['value'])
+                room_id,
+                criterion_id,
+                value
+            FROM room_attributes
+            WHERE room_id = ANY(%s)
+              AND criterion_id = ANY(%s)
+        """, (list(room_ids), list(id_index)))
+        
+        # One row per requested room, in room_id order; rooms without any
+        # attribute row are dropped at the end, missing values stay 0.0.
+        # float32: attribute values carry at most ~6 significant digits, and
+        # half-width rows halve the memory traffic of the scoring passes
+        requested_ids = sorted(set(room_ids))
+        criterion_codes_ordered = criterion_codes
+        room_index = {room_id: i for i, room_id in enumerate(requested_ids)}
+        matrix = np.zeros((len(requested_ids), len(criterion_codes_ordered)), dtype=np.float32)
+        has_attributes = np.zeros(len(requested_ids), dtype=bool)
+        
+        # Scatter each batch of (room, criterion, value) triples into the
+        # matrix with one vectorized assignment
+        while True:
+            rows = cursor.fetchmany(self.FETCH_BATCH_SIZE)
+            if not rows:
+                break
             
-            if room_id not in data_dict:
-                data_dict[room_id] = {}
-            data_dict[room_id][code] = value
+            has_attributes[[room_index[row['room_id']] for row in rows]] = True
+            cells = [
+                (room_index[row['room_id']], id_index[row['criterion_id']], row['value'])
+                for row in rows
+                if row['criterion_id'] in id_index
+            ]
+            if cells:
+                row_idx, col_idx, values = zip(*cells)
+                matrix[row_idx, col_idx] = np.array(values, dtype=np.float32)
         
-        # Convert to numpy matrix
-        room_ids_ordered = sorted(data_dict.keys())
-        criterion_codes_ordered = criterion_codes
+        cursor.close()
         
-        matrix = []
-        for room_id in room_ids_ordered:
-            row = []
-            for code in criterion_codes_ordered:
-                value = data_dict.get(room_id, {}).get(code, 0.0)
-                row.append(value)
-            matrix.append(row)
+        matrix = matrix[has_attributes]
+        room_ids_ordered = [room_id for room_id, found in zip(requested_ids, has_attributes.tolist()) if found]
         
-        cursor.close()
-        return np.array(matrix, dtype=float), room_ids_ordered, criterion_codes_ordered
+        return matrix, room_ids_ordered, criterion_codes_ordered
     
     def normalize_matrix(self, matrix: np.ndarray) -> np.ndarray:
         """
         Normalize decision matrix using vector normalization
         r_ij = x_ij / sqrt(sum(x_ij^2))
         """
-        # Calculate sum of squares for each column
-        sum_of_squares = np.sum(matrix ** 2, axis=0)
+        # Euclidean norm of each column in one call
+        norms = np.linalg.norm(matrix, axis=0)
         
         # Avoid division by zero
-        sum_of_squares = np.where(sum_of_squares == 0, 1, sum_of_squares)
+        norms[norms == 0] = 1.0
         
         # Normalize
-        normalized = matrix / np.sqrt(sum_of_squares)
-        
-        return normalized
+        return matrix / norms
     
     def apply_weights(self, normalized_matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
         """
@@ -107,20 +240,13 @@ class TOPSISEngine:
             - ideal_best: A+ array
             - ideal_worst: A- array
         """
-        ideal_best = np.zeros(weighted_matrix.shape[1])
-        ideal_worst = np.zeros(weighted_matrix.shape[1])
+        column_max = weighted_matrix.max(axis=0)
+        column_min = weighted_matrix.min(axis=0)
         
-        for j in range(weighted_matrix.shape[1]):
-            column = weighted_matrix[:, j]
-            
-            if is_benefit[j]:
-                # Benefit criterion: max is best, min is worst
-                ideal_best[j] = np.max(column)
-                ideal_worst[j] = np.min(column)
-            else:
-                # Cost criterion: min is best, max is worst
-                ideal_best[j] = np.min(column)
-                ideal_worst[j] = np.max(column)
+        # Benefit criterion: max is best, min is worst
+        # Cost criterion: min is best, max is worst
+        ideal_best = np.where(is_benefit, column_max, column_min)
+        ideal_worst = np.where(is_benefit, column_min, column_max)
         
         return ideal_best, ideal_worst
     
@@ -157,7 +283,59 @@ class TOPSISEngine:
         
         return scores
     
+    def _topsis_core(self, matrix: np.ndarray, weights: np.ndarray,
+                     is_benefit: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        TOPSIS steps 1-5 fused, with as few (m, n) temporaries as possible
+        
+        Same math as normalize_matrix() -> apply_weights() -> get_ideal_solutions()
+        -> calculate_distances() -> calculate_similarity_scores().
+        Returns: (scores, distance_to_best, distance_to_worst, weighted_matrix)
+        """
+        if HAS_COMPILED_KERNEL and matrix.dtype == np.float32:
+            m = matrix.shape[0]
+            weighted = np.empty_like(matrix)
+            distance_to_best = np.empty(m, dtype=np.float32)
+            distance_to_worst = np.empty(m, dtype=np.float32)
+            scores = np.empty(m, dtype=np.float32)
+            _topsis_compiled(np.ascontiguousarray(matrix), weights.astype(np.float32),
+                             np.ascontiguousarray(is_benefit, dtype=np.uint8),
+                             weighted, distance_to_best, distance_to_worst, scores)
+            return scores, distance_to_best, distance_to_worst, weighted
+        
+        if HAS_TOPSIS_KERNEL:
+            m, n = matrix.shape
+            weighted = np.empty_like(matrix)
+            ideal_best = np.empty(n, dtype=matrix.dtype)
+            ideal_worst = np.empty(n, dtype=matrix.dtype)
+            distance_to_best = np.empty(m, dtype=matrix.dtype)
+            distance_to_worst = np.empty(m, dtype=matrix.dtype)
+            scores = np.empty(m, dtype=matrix.dtype)
+            kernel = _make_kernel(n)
+            kernel(np.ascontiguousarray(matrix), weights.astype(matrix.dtype), is_benefit,
+                   weighted, ideal_best, ideal_worst,
+                   distance_to_best, distance_to_worst, scores)
+            return scores, distance_to_best, distance_to_worst, weighted
+        
+        # Normalize and weight in one pass: v_ij = x_ij * w_j / sqrt(sum_i(x_ij^2))
+        norms = np.linalg.norm(matrix, axis=0)
+        norms[norms == 0] = 1.0
+        weighted = matrix * (weights / norms)
+        
+        ideal_best, ideal_worst = self.get_ideal_solutions(weighted, is_benefit)
+        
+        # One difference buffer, reused for both distances
+        diff = weighted - ideal_best
+        distance_to_best = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        np.subtract(weighted, ideal_worst, out=diff)
+        distance_to_worst = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        
+        scores = self.calculate_similarity_scores(distance_to_best, distance_to_worst)
+        
+        return scores, distance_to_best, distance_to_worst, weighted
+    
     def rank_alternatives(self, 
+                        conn,
                         room_ids: List[int], 
                         criterion_weights: Dict[str, float],
                         filters: Optional[Dict] = None) -> List[Dict]:
@@ -165,6 +343,7 @@ class TOPSISEngine:
         Complete TOPSIS ranking process
         
         Args:
+            conn: psycopg2 connection used to read the decision matrix
             room_ids: List of room IDs to evaluate
             criterion_weights: Dict mapping criterion codes to weights
             filters: Optional filters to apply
@@ -172,75 +351,54 @@ class TOPSISEngine:
         Returns:
             List of ranked results with scores and explanations
         """
-        # Get criteria information
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
-        
-        criterion_codes = list(criterion_weights.keys())
-        criterion_codes_str = ','.join([f"'{code}'" for code in criterion_codes])
-        
-        cursor.execute(f"""
-            SELECT code, is_benefit, name, unit
-            FROM criteria
-            WHERE code IN ({criterion_codes_str})
-            ORDER BY display_order
-        """)
-        
-        criteria_info = {row['code']: dict(row) for row in cursor.fetchall()}
-        cursor.close()
-        
-        # Ensure criterion_codes are in the order we have info for
-        criterion_codes = [code for code in criterion_codes if code in criteria_info]
+        # Get criteria information (loaded once per engine if not preloaded)
+        criteria = self._load_criteria(conn)
+        
+        # Weighted criteria we have info for, in weight order (one pass)
+        criterion_codes = []
+        criteria_info = {}
+        for code in criterion_weights:
+            info = criteria.get(code)
+            if info is not None:
+                criterion_codes.append(code)
+                criteria_info[code] = info
         
         # Get decision matrix
         matrix, room_ids_ordered, criterion_codes_ordered = self.get_decision_matrix(
-            room_ids, criterion_codes
+            conn, room_ids, criterion_codes
         )
         
         if matrix.size == 0:
             return []
         
         # Prepare weights and benefit flags
-        weights = np.array([criterion_weights[code] for code in criterion_codes_ordered])
-        is_benefit = np.array([criteria_info[code]['is_benefit'] for code in criterion_codes_ordered])
+        weights = np.array([criterion_weights[code] for code in criterion_codes_ordered], dtype=np.float32)
+        is_benefit = np.array([criteria_info[code]['is_benefit'] for code in criterion_codes_ordered], dtype=bool)
         
-        # TOPSIS Algorithm Steps
+        # TOPSIS Algorithm Steps 1-5: normalize, weight, ideal solutions,
+        # distances and similarity scores
+        scores, dist_to_best, dist_to_worst, weighted = self._topsis_core(matrix, weights, is_benefit)
         
-        # Step 1: Normalize matrix
-        normalized = self.normalize_matrix(matrix)
-        
-        # Step 2: Apply weights
-        weighted = self.apply_weights(normalized, weights)
-        
-        # Step 3: Determine ideal solutions
-        ideal_best, ideal_worst = self.get_ideal_solutions(weighted, is_benefit)
+        # Step 6: Rank alternatives, by score descending (ties keep room order)
+        order = np.argsort(-scores, kind='stable')
         
-        # Step 4: Calculate distances
-        dist_to_best, dist_to_worst = self.calculate_distances(weighted, ideal_best, ideal_worst)
+        # Convert to Python floats in one pass per array, not per cell
+        scores_list = scores.tolist()
+        dist_to_best_list = dist_to_best.tolist()
+        dist_to_worst_list = dist_to_worst.tolist()
+        weighted_rows = weighted.tolist()
         
-        # Step 5: Calculate similarity scores
-        scores = self.calculate_similarity_scores(dist_to_best, dist_to_worst)
-        
-        # Step 6: Rank alternatives
         results = []
-        for i, room_id in enumerate(room_ids_ordered):
+        for rank, i in enumerate(order.tolist(), 1):
             results.append({
-                'room_id': room_id,
-                'topsis_score': float(scores[i]),
-                'distance_to_ideal': float(dist_to_best[i]),
-                'distance_to_worst': float(dist_to_worst[i]),
-                'normalized_values': {
-                    code: float(weighted[i, j]) 
-                    for j, code in enumerate(criterion_codes_ordered)
-                }
+                'room_id': room_ids_ordered[i],
+                'topsis_score': scores_list[i],
+                'distance_to_ideal': dist_to_best_list[i],
+                'distance_to_worst': dist_to_worst_list[i],
+                'normalized_values': dict(zip(criterion_codes_ordered, weighted_rows[i])),
+                'rank': rank
             })
         
-        # Sort by score descending
-        results.sort(key=lambda x: x['topsis_score'], reverse=True)
-        
-        # Add rank
-        for rank, result in enumerate(results, 1):
-            result['rank'] = rank
-        
         # Generate explanations
         results = self.add_explanations(results, matrix, room_ids_ordered, 
                                        criterion_codes_ordered, criterion_weights, 
@@ -261,47 +419,37 @@ class TOPSISEngine:
         top_criteria = sorted(weights.items(), key=lambda x: x[1], reverse=True)[:3]
         top_codes = [code for code, _ in top_criteria]
         
+        # Compare every room to the column average of each top criterion at once
+        room_index = {room_id: i for i, room_id in enumerate(room_ids_ordered)}
+        code_index = {code: j for j, code in enumerate(criterion_codes)}
+        top_values = matrix[:, [code_index[code] for code in top_codes]]
+        top_averages = top_values.mean(axis=0)
+        above = top_values > top_averages * 1.1  # 10% above average
+        below = top_values < top_averages * 0.9  # 10% below average
+        
+        # Benefit criterion: above average is a strength, below a weakness;
+        # cost criterion (lower is better): the other way around
+        top_benefit = np.array([criteria_info[code]['is_benefit'] for code in top_codes], dtype=bool)
+        strong = np.where(top_benefit, above, below).tolist()
+        weak = np.where(top_benefit, below, above).tolist()
+        top_names = [criteria_info[code]['name'] for code in top_codes]
+        leads = self.EXPLANATION_LEADS
+        
         for result in results:
-            room_id = result['room_id']
-            room_idx = room_ids_ordered.index(room_id)
+            room_idx = room_index[result['room_id']]
             
             # Analyze strengths and weaknesses
-            strengths = []
-            weaknesses = []
-            
-            for code in top_codes:
-                col_idx = criterion_codes.index(code)
-                value = matrix[room_idx, col_idx]
-                is_benefit = criteria_info[code]['is_benefit']
-                
-                # Compare to average
-                avg_value = np.mean(matrix[:, col_idx])
-                
-                if is_benefit:
-                    if value > avg_value * 1.1:  # 10% better than average
-                        strengths.append(criteria_info[code]['name'])
-                    elif value < avg_value * 0.9:  # 10% worse than average
-                        weaknesses.append(criteria_info[code]['name'])
-                else:  # Cost criterion (lower is better)
-                    if value < avg_value * 0.9:  # 10% better (lower) than average
-                        strengths.append(criteria_info[code]['name'])
-                    elif value > avg_value * 1.1:  # 10% worse (higher) than average
-                        weaknesses.append(criteria_info[code]['name'])
+            strengths = [name for name, hit in zip(top_names, strong[room_idx]) if hit]
+            weaknesses = [name for name, hit in zip(top_names, weak[room_idx]) if hit]
             
             # Generate explanation
-            explanation_parts = []
-            
-            if result['rank'] == 1:
-                explanation_parts.append("Best overall match")
-            elif result['rank'] <= 3:
-                explanation_parts.append("Excellent choice")
-            elif result['rank'] <= 10:
-                explanation_parts.append("Good option")
+            rank = result['rank']
+            explanation_parts = [leads[rank]] if rank < len(leads) else []
             
             if strengths:
                 explanation_parts.append(f"Strong in: {', '.join(strengths)}")
             
-            if weaknesses and result['rank'] > 1:
+            if weaknesses and rank > 1:
                 explanation_parts.append(f"Trade-off: {', '.join(weaknesses)}")
             
             result['explanation'] = '. '.join(explanation_parts) if explanation_parts else "Balanced option"
@@ -316,14 +464,18 @@ def example_usage():
     
     load_dotenv()
     
-    # Connect to database
-    conn = psycopg2.connect(
+    # Borrow connections from a pool, as the API does (src/api/database.py):
+    # the engines hold no connection, so each call can use any pooled one
+    pool = ThreadedConnectionPool(
+        minconn=1,
+        maxconn=int(os.getenv('DB_POOL_MAX', '10')),
         dbname=os.getenv('DB_NAME', 'stayhub'),
         user=os.getenv('DB_USER', 'stayhub_user'),
         password=os.getenv('DB_PASSWORD', 'stayhub_password'),
         host=os.getenv('DB_HOST', 'localhost'),
         port=os.getenv('DB_PORT', '5432')
     )
+    conn = pool.getconn()
     
     # Get some room IDs (top 20 by rating)
     cursor = conn.cursor()
@@ -337,7 +489,7 @@ def example_usage():
     cursor.close()
     
     # Create engine
-    engine = TOPSISEngine(conn)
+    engine = TOPSISEngine.build_from_db(conn)
     
     # Define criterion weights (these would come from InfluenceEngine)
     weights = {
@@ -350,7 +502,7 @@ def example_usage():
     }
     
     # Rank alternatives
-    results = engine.rank_alternatives(room_ids, weights)
+    results = engine.rank_alternatives(conn, room_ids, weights)
     
     # Display top 5
     print("\n" + "="*80)
@@ -364,7 +516,8 @@ def example_usage():
     
     print("\n" + "="*80 + "\n")
     
-    conn.close()
+    pool.putconn(conn)
+    pool.closeall()
 
 
 if __name__ == '__main__':
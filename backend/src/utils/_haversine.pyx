@@ -0,0 +1,30 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+# distutils: extra_compile_args = -O3 -fopenmp
+# distutils: extra_link_args = -fopenmp
+"""
+Compiled Haversine kernel (optional, built by `make build-ext`)
+
+The loop runs without the GIL, split across OpenMP threads.
+"""
+
+from cython.parallel cimport prange
+from libc.math cimport asin, cos, sin, sqrt, M_PI
+
+cdef double EARTH_RADIUS_KM = 6371.0
+cdef double DEG_TO_RAD = M_PI / 180.0
+
+
+def haversine_batch(double lat, double lon, const double[::1] lats, const double[::1] lons, double[::1] out):
+    """Fill `out` with distances in km from (lat, lon) to each point"""
+    cdef Py_ssize_t i, n = lats.shape[0]
+    cdef double ref_lat = lat * DEG_TO_RAD
+    cdef double ref_lon = lon * DEG_TO_RAD
+    cdef double cos_ref_lat = cos(ref_lat)
+    cdef double p_lat, d_lat, d_lon, a
+
+    for i in prange(n, nogil=True, schedule='static'):
+        p_lat = lats[i] * DEG_TO_RAD
+        d_lat = p_lat - ref_lat
+        d_lon = lons[i] * DEG_TO_RAD - ref_lon
+        a = sin(d_lat / 2) ** 2 + cos_ref_lat * cos(p_lat) * sin(d_lon / 2) ** 2
+        out[i] = 2 * EARTH_RADIUS_KM * asin(sqrt(a))
@@ -0,0 +1,87 @@
+"""
+Geographic helpers
+Vectorized great-circle distance computations
+"""
+
+import math
+
+import numpy as np
+
+try:
+    # Cython kernel from `make build-ext` (runs without the GIL)
+    from ._haversine import haversine_batch as _haversine_compiled
+    HAS_COMPILED_KERNEL = True
+except ImportError:  # Extension not built
+    HAS_COMPILED_KERNEL = False
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # Optional dependency, fall back to plain NumPy
+    HAS_NUMBA = False
+
+
+# Mean radius of earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+
+def _haversine_numpy(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """NumPy implementation, used when numba is not installed"""
+    lats = np.radians(lats)
+    lons = np.radians(lons)
+    ref_lat = np.radians(lat)
+    ref_lon = np.radians(lon)
+
+    a = np.sin((lats - ref_lat) / 2) ** 2 + np.cos(ref_lat) * np.cos(lats) * np.sin((lons - ref_lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+if HAS_NUMBA:
+    # Serial loop: the API calls this from FastAPI's threadpool, where numba's
+    # default (workqueue) parallel backend must not be entered concurrently.
+    # No cache=True: the module is imported both as `src.utils.geo` (API) and
+    # `utils.geo` (importer script), and the on-disk cache records the module
+    # name, so a cache written by one fails to load from the other.
+    @njit(fastmath=True)
+    def haversine_batch(lat, lon, lats, lons, out):
+        """Fill `out` with distances in km from (lat, lon) to each point (compiled)"""
+        ref_lat = math.radians(lat)
+        ref_lon = math.radians(lon)
+        cos_ref_lat = math.cos(ref_lat)
+        for i in range(lats.shape[0]):
+            p_lat = math.radians(lats[i])
+            d_lat = p_lat - ref_lat
+            d_lon = math.radians(lons[i]) - ref_lon
+            a = math.sin(d_lat / 2) ** 2 + cos_ref_lat * math.cos(p_lat) * math.sin(d_lon / 2) ** 2
+            out[i] = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """
+    Calculate distances in kilometers from one point to many using the Haversine formula
+
+    Uses the compiled Cython kernel if it was built, else a Numba-compiled
+    kernel when numba is available, NumPy otherwise.
+
+    Args:
+        lat, lon: reference point in degrees
+        lats, lons: sequences/arrays of latitudes and longitudes in degrees
+
+    Returns:
+        float64 array of distances, one per input point
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+
+    if HAS_COMPILED_KERNEL:
+        out = np.empty(lats.shape[0], dtype=np.float64)
+        _haversine_compiled(float(lat), float(lon),
+                            np.ascontiguousarray(lats), np.ascontiguousarray(lons), out)
+        return out
+
+    if not HAS_NUMBA:
+        return _haversine_numpy(lat, lon, lats, lons)
+
+    out = np.empty(lats.shape[0], dtype=np.float64)
+    haversine_batch(float(lat), float(lon), lats, lons, out)
+    return out
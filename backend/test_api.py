@@ -4,17 +4,29 @@ Quick API test script
 Run after starting the API server to verify everything works
 """
 
-import requests
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
 import json
 import time
 
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive connection pool shared by all tests (thread-safe)
+SESSION = httpx.Client(timeout=30.0)
+
+# Set TEST_SEQUENTIAL=1 to run the tests one after another (easier debugging)
+SEQUENTIAL = os.getenv('TEST_SEQUENTIAL', '0') == '1'
+
 
 def test_health():
     """Test health endpoint"""
     print("🏥 Testing health endpoint...")
-    response = requests.get(f"{BASE_URL}/health")
+    response = SESSION.get(f"{BASE_URL}/health")
     
     assert response.status_code == 200, f"Health check failed: {response.status_code}"
     
@@ -33,7 +45,7 @@ def test_health():
 def test_stats():
     """Test statistics endpoint"""
     print("\n📊 Testing stats endpoint...")
-    response = requests.get(f"{BASE_URL}/stats")
+    response = SESSION.get(f"{BASE_URL}/stats")
     
     assert response.status_code == 200, f"Stats failed: {response.status_code}"
     
@@ -53,7 +65,7 @@ def test_stats():
 def test_criteria():
     """Test criteria endpoint"""
     print("\n🎯 Testing criteria endpoint...")
-    response = requests.get(f"{BASE_URL}/api/v1/criteria")
+    response = SESSION.get(f"{BASE_URL}/api/v1/criteria")
     
     assert response.status_code == 200, f"Criteria failed: {response.status_code}"
     
@@ -70,7 +82,7 @@ def test_criteria():
 def test_influence_diagram():
     """Test influence diagram endpoint"""
     print("\n🌳 Testing influence diagram endpoint...")
-    response = requests.get(f"{BASE_URL}/api/v1/influence-diagram")
+    response = SESSION.get(f"{BASE_URL}/api/v1/influence-diagram")
     
     assert response.status_code == 200, f"Influence diagram failed: {response.status_code}"
     
@@ -107,7 +119,7 @@ def test_recommendations():
     print(f"   - Min Rating: {payload['filters']['min_rating']}")
     
     start_time = time.time()
-    response = requests.post(f"{BASE_URL}/api/v1/dss/recommend", json=payload)
+    response = SESSION.post(f"{BASE_URL}/api/v1/dss/recommend", json=payload)
     elapsed = (time.time() - start_time) * 1000
     
     assert response.status_code == 200, f"Recommendations failed: {response.status_code} - {response.text}"
@@ -143,6 +155,43 @@ def test_recommendations():
         assert 0 <= result['topsis_score'] <= 1
 
 
+class _ThreadOutput(io.TextIOBase):
+    """stdout that sends each worker thread's prints to that thread's own buffer"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+    
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+
+def run_test(test_func, output: _ThreadOutput = None):
+    """Run one test; returns (passed, printed output when captured)"""
+    if output is not None:
+        output.local.buffer = io.StringIO()
+    
+    try:
+        test_func()
+        passed = True
+    except AssertionError as e:
+        print(f"   ❌ Assertion failed: {e}")
+        passed = False
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        passed = False
+    
+    if output is None:
+        return passed, ''
+    text = output.local.buffer.getvalue()
+    output.local.buffer = None
+    return passed, text
+
+
 def main():
     """Main function for running tests manually (not via pytest)"""
     print("=" * 60)
@@ -152,8 +201,8 @@ def main():
     
     # Check if API is running
     try:
-        requests.get(BASE_URL, timeout=2)
-    except requests.exceptions.ConnectionError:
+        SESSION.get(BASE_URL, timeout=2)
+    except httpx.ConnectError:
         print("❌ Cannot connect to API!")
         print(f"   Make sure the API is running at {BASE_URL}")
         print("   Run: make dev")
@@ -169,16 +218,26 @@ def main():
     ]
     
     results = []
-    for test_name, test_func in tests:
+    if SEQUENTIAL:
+        for test_name, test_func in tests:
+            passed, _ = run_test(test_func)
+            results.append((test_name, passed))
+    else:
+        # The tests are independent: overlap their requests, then print each
+        # test's output in the usual order
+        output = _ThreadOutput(sys.stdout)
+        sys.stdout = output
         try:
-            test_func()
-            results.append((test_name, True))
-        except AssertionError as e:
-            print(f"   ❌ Assertion failed: {e}")
-            results.append((test_name, False))
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-            results.append((test_name, False))
+            with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+                futures = [(test_name, executor.submit(run_test, test_func, output))
+                           for test_name, test_func in tests]
+                outcomes = [(test_name, future.result()) for test_name, future in futures]
+        finally:
+            sys.stdout = output.stream
+        
+        for test_name, (passed, text) in outcomes:
+            print(text, end='')
+            results.append((test_name, passed))
     
     # Summary
     print("\n" + "=" * 60)